@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for receipt_processor.py
+
+Generates synthetic ICA and Willy's receipts with a growing number of full
+pages and parses each one in a fresh interpreter, recording the peak resident
+set size. Pages are laid out one at a time and released once read, so the
+peak should stay roughly flat as receipts get longer rather than growing with
+the page count. A run where the parser misses items is reported and fails,
+since its memory figures don't cover the whole receipt:
+
+    uv run python benchmarks/bench_memory.py
+    uv run python benchmarks/bench_memory.py --pages 1 8 64 --json memory.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_generator import generate_receipt  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Items that fit on one generated page
+ITEMS_PER_PAGE = 50
+
+# Run in a child process: import everything, note the baseline, parse, report the peak
+MEASURE_SCRIPT = """
+import json, resource, sys
+from receipt_processor import ReceiptDocument, create_store_parser
+import pdfplumber
+
+def peak_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+baseline = peak_kb()
+with ReceiptDocument(sys.argv[2]) as document:
+    receipt = create_store_parser(sys.argv[1]).parse(document)
+print(json.dumps({'baseline_kb': baseline, 'peak_kb': peak_kb(), 'items': len(receipt.items)}))
+"""
+
+
+def measure(store: str, pdf_path: str) -> dict:
+    """Parse one receipt in a fresh interpreter and return its memory figures."""
+    result = subprocess.run([sys.executable, '-c', MEASURE_SCRIPT, store, pdf_path],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(workdir: Path, stores: List[str], page_counts: List[int]) -> List[dict]:
+    results = []
+    for store in stores:
+        for pages in page_counts:
+            pdf_path = str(workdir / f"{store.lower()}-{pages}p.pdf")
+            spec = generate_receipt(pdf_path, store, items=ITEMS_PER_PAGE * pages, pages=pages)
+            figures = measure(store, pdf_path)
+            growth_kb = figures['peak_kb'] - figures['baseline_kb']
+            complete = figures['items'] == len(spec.lines)
+            results.append({'store': store, 'pages': spec.pages, 'items_expected': len(spec.lines),
+                            'complete': complete, 'growth_kb': growth_kb, **figures})
+            print(f"{store:<7} {spec.pages:4d} pages  peak RSS {figures['peak_kb'] / 1024:7.1f} MB  "
+                  f"(+{growth_kb / 1024:6.1f} MB while parsing, {figures['items']}/{len(spec.lines)} items)"
+                  f"{'' if complete else '  INCOMPLETE'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure peak memory of the receipt parsers as receipts get longer')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help='Page counts to generate (default: 1 2 4 8 16 32)')
+    parser.add_argument('--store', choices=['ICA', 'WILLYS'], help='Only benchmark one store')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    stores = [args.store] if args.store else ['ICA', 'WILLYS']
+    with tempfile.TemporaryDirectory(prefix='receipt-memory-') as workdir:
+        results = run_benchmarks(Path(workdir), stores, sorted(args.pages))
+
+    for store in stores:
+        rows = [r for r in results if r['store'] == store]
+        if len(rows) > 1 and rows[-1]['pages'] > rows[0]['pages']:
+            slope = (rows[-1]['growth_kb'] - rows[0]['growth_kb']) / (rows[-1]['pages'] - rows[0]['pages'])
+            print(f"{store}: {slope:+.0f} KB of peak memory per extra page")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'items_per_page': ITEMS_PER_PAGE, 'results': results}, f, indent=2)
+        print(f"\nWrote results to {args.json}")
+
+    incomplete = [r for r in results if not r['complete']]
+    if incomplete:
+        print(f"\n{len(incomplete)} receipt(s) were not parsed completely; their memory figures are not comparable")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
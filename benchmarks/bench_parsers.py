@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Parser benchmark for receipt_processor.py
+
+Generates synthetic ICA and Willy's receipts of several sizes, then times
+`parse_items`, `extract_total` and `extract_date` separately (each opens the PDF
+on its own, as the path-based API does) and `StoreParser.parse` end-to-end on a
+single `ReceiptDocument`. Results are written as JSON so that runs before and
+after a parser change can be compared:
+
+    uv run python benchmarks/bench_parsers.py --json before.json
+    # ... change the parser ...
+    uv run python benchmarks/bench_parsers.py --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from receipt_generator import generate_receipt  # noqa: E402
+from receipt_processor import ICAParser, ReceiptDocument, WillysParser  # noqa: E402
+
+# (store, items, pages): sizes from a quick top-up to a large multi-page shop
+SCENARIOS = [
+    ('ICA', 10, 1),
+    ('ICA', 40, 1),
+    ('ICA', 150, 3),
+    ('WILLYS', 10, 1),
+    ('WILLYS', 40, 1),
+    ('WILLYS', 150, 3),
+]
+
+
+def time_operation(operation: Callable[[], object], repeat: int) -> List[float]:
+    """Run an operation `repeat` times and return each wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    median = statistics.median(ordered)
+    return {
+        'runs': len(ordered),
+        'min_ms': ordered[0],
+        'median_ms': median,
+        'p95_ms': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'max_ms': ordered[-1],
+        'throughput_per_s': 1000 / median if median else 0.0,
+    }
+
+
+def parse_document(parser, pdf_path: str):
+    with ReceiptDocument(pdf_path) as document:
+        return parser.parse(document)
+
+
+def run_benchmarks(workdir: Path, repeat: int, scenarios: list) -> List[dict]:
+    results = []
+    for store, items, pages in scenarios:
+        name = f"{store.lower()}-{items}items-{pages}p"
+        pdf_path = str(workdir / f"{name}.pdf")
+        spec = generate_receipt(pdf_path, store, items=items, pages=pages)
+        parser = ICAParser() if store == 'ICA' else WillysParser()
+
+        parsed = parse_document(parser, pdf_path)
+        operations = {
+            'parse_items': lambda: parser.parse_items(pdf_path),
+            'extract_total': lambda: parser.extract_total(pdf_path),
+            'extract_date': lambda: parser.extract_date(pdf_path),
+            'parse': lambda: parse_document(parser, pdf_path),
+        }
+
+        for operation_name, operation in operations.items():
+            stats = summarize(time_operation(operation, repeat))
+            results.append({
+                'scenario': name,
+                'store': store,
+                'pages': spec.pages,
+                'operation': operation_name,
+                'items_expected': len(spec.lines),
+                'items_found': len(parsed.items),
+                'total_matches': parsed.total == spec.total,
+                **stats,
+            })
+            print(f"{name:<22} {operation_name:<14} median {stats['median_ms']:8.2f} ms  "
+                  f"p95 {stats['p95_ms']:8.2f} ms  {stats['throughput_per_s']:7.1f}/s")
+
+        # Separate calls open the PDF three times; parse() opens it once
+        separate = sum(r['median_ms'] for r in results[-4:-1])
+        print(f"{name:<22} {'separate/parse':<14} {separate / results[-1]['median_ms']:.2f}x  "
+              f"(items {len(parsed.items)}/{len(spec.lines)}, total {'ok' if parsed.total == spec.total else 'MISMATCH'})")
+
+    return results
+
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> bool:
+    """Print median changes against a previous results file. Returns True if anything regressed."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['scenario'], r['operation']): r for r in json.load(f)['results']}
+
+    regressed = False
+    print(f"\nCompared with {baseline_path} (regression threshold {threshold:.0%}):")
+    for result in results:
+        before = baseline.get((result['scenario'], result['operation']))
+        if not before:
+            continue
+        change = result['median_ms'] / before['median_ms'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"  {result['scenario']:<22} {result['operation']:<14} {before['median_ms']:8.2f} -> "
+              f"{result['median_ms']:8.2f} ms ({change:+.1%}){flag}")
+    return regressed
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the receipt parsers on synthetic receipts')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per operation (default: 10)')
+    parser.add_argument('--store', choices=['ICA', 'WILLYS'], help='Only benchmark one store')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Previous results JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown counted as a regression (default: 0.10)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if any operation regressed')
+
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if not args.store or s[0] == args.store]
+    with tempfile.TemporaryDirectory(prefix='receipt-bench-') as workdir:
+        results = run_benchmarks(Path(workdir), args.repeat, scenarios)
+
+    import pdfplumber
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'pdfplumber': pdfplumber.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote results to {args.json}")
+
+    if args.compare and compare(results, args.compare, args.threshold) and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for receipt_processor.py
+
+Imports the module in fresh interpreters under `python -X importtime`, reports the
+cumulative import cost and fails when it exceeds a budget, or when a module that
+must stay lazy (the Google Sheets client stack, pdfplumber) is imported eagerly.
+
+Usage:
+    uv run python benchmarks/import_time.py
+    uv run python benchmarks/import_time.py --budget-ms 80 --runs 7 --json import_time.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that CSV-only runs must never import at startup
+LAZY_MODULES = [
+    'googleapiclient',
+    'google.auth',
+    'google.oauth2',
+    'google_auth_oauthlib',
+    'pdfplumber',
+]
+
+
+def measure_import(module: str) -> Tuple[int, Dict[str, int]]:
+    """Import a module in a fresh interpreter.
+
+    Returns:
+        Cumulative import time of the module in microseconds, and the
+        cumulative time of every module imported along the way
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imported[name.strip()] = int(cumulative)
+
+    return imported[module], imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the startup import cost of receipt_processor.py against a budget')
+    parser.add_argument('--module', default='receipt_processor', help='Module to import (default: receipt_processor)')
+    parser.add_argument('--budget-ms', type=float, default=150.0, help='Maximum median cumulative import time (default: 150 ms)')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to measure (default: 5)')
+    parser.add_argument('--top', type=int, default=10, help='Number of most expensive imports to list (default: 10)')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    # Warm-up run so the first measurement doesn't include writing .pyc files
+    measure_import(args.module)
+
+    timings = []
+    imported = {}
+    for _ in range(args.runs):
+        total_us, imported = measure_import(args.module)
+        timings.append(total_us)
+
+    median_ms = statistics.median(timings) / 1000
+    eager = sorted(name for name in imported
+                   if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY_MODULES))
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.1f} ms)")
+    print("Most expensive imports (cumulative):")
+    for name, cumulative in sorted(imported.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'module': args.module,
+                'runs_us': timings,
+                'median_ms': median_ms,
+                'budget_ms': args.budget_ms,
+                'eager_lazy_modules': eager,
+                'imports_us': imported,
+            }, f, indent=2)
+
+    failed = False
+    if eager:
+        print(f"Error: modules that must be imported lazily were imported at startup: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"Error: import time {median_ms:.1f} ms exceeds the budget of {args.budget_ms:.1f} ms")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
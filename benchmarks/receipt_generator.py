@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Synthetic receipt PDF generator
+
+Writes realistic ICA and Willy's receipt PDFs without any PDF library, so the
+parsers can be benchmarked locally without real receipts:
+
+- ICA: a ruled "Beskrivning / Artikelnummer / Pris / Mängd / Summa" table,
+  discount rows and a "Betalat" total
+- Willy's: plain text lines between "Start Självscanning" and "Slut Självscanning",
+  with multi-quantity lines, weighted "kg*kr/kg" lines (on the item line or on
+  the following line), "Rabatt:" discounts, "+PANT" deposits and a "Totalt ... SEK" total
+
+Receipts longer than one page continue on the next page, as the real ones do.
+
+Usage:
+    uv run python benchmarks/receipt_generator.py --store ICA --items 40 --pages 2 --output bills/synthetic
+"""
+
+import argparse
+import random
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+TOP_MARGIN = 50
+BOTTOM_MARGIN = 50
+LINE_HEIGHT = 14
+FONT_SIZE = 9
+
+PRODUCTS = [
+    'Grönkålsblad ICA', 'Gul lök ICA', 'Havregurt ugnsbaka', 'Mjölk 3% 1L', 'Smör normalsaltat',
+    'Ägg 12p frigående', 'Vetemjöl 2kg', 'Pasta penne 1kg', 'Krossade tomater', 'Kaffe mellanrost',
+    'Knäckebröd råg', 'Falukorv', 'Kycklingfilé', 'Laxfilé fryst', 'Potatis fast',
+    'Morötter 1kg', 'Äpple Royal Gala', 'Yoghurt naturell', 'Havredryck 1L', 'Bröd surdeg',
+    'Ost Herrgård', 'Bananer', 'Tomater kvist', 'Gurka', 'Paprika röd',
+]
+WEIGHTED_PRODUCTS = ['Bananer', 'Ost Herrgård', 'Tomater kvist', 'Äpple Royal Gala', 'Potatis fast']
+PANT_LINES = [('+PANT ALUMINIUMBURK 1KR', 100), ('+PANT ENG PET >1L 2KR', 200)]
+
+
+@dataclass
+class ReceiptSpec:
+    """What a synthetic receipt contains, and what the parsers should find in it."""
+    store: str
+    date: str
+    lines: List[Tuple[str, int]] = field(default_factory=list)  # (item name, amount in öre)
+    pages: int = 1
+
+    @property
+    def total_ore(self) -> int:
+        return sum(amount for _, amount in self.lines)
+
+    @property
+    def total(self) -> str:
+        return format_amount(self.total_ore, '.')
+
+
+def format_amount(ore: int, decimal_separator: str = ',') -> str:
+    """Format an amount in öre as a Swedish receipt price, e.g. 6986 -> "69,86"."""
+    sign = '-' if ore < 0 else ''
+    ore = abs(ore)
+    return f"{sign}{ore // 100}{decimal_separator}{ore % 100:02d}"
+
+
+def _pdf_string(text: str) -> bytes:
+    """Encode text as a PDF literal string for a WinAnsiEncoding font."""
+    raw = text.encode('cp1252')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def write_pdf(path: str, pages: List[List[tuple]]) -> None:
+    """Write a minimal PDF.
+
+    Each page is a list of drawing operations:
+        ('text', x, y, text) or ('line', x1, y1, x2, y2)
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Pages tree, filled in once the page object numbers are known
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    page_numbers = []
+
+    for operations in pages:
+        content = []
+        for operation in operations:
+            if operation[0] == 'text':
+                _, x, y, text = operation
+                content.append(b'BT /F1 %d Tf %.2f %.2f Td ' % (FONT_SIZE, x, y) + _pdf_string(text) + b' Tj ET')
+            else:
+                _, x1, y1, x2, y2 = operation
+                content.append(b'%.2f %.2f m %.2f %.2f l S' % (x1, y1, x2, y2))
+        stream = zlib.compress(b'\n'.join(content))
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+                       % (PAGE_WIDTH, PAGE_HEIGHT, len(objects)))
+        page_numbers.append(len(objects))
+
+    objects[1] = (b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % n for n in page_numbers)
+                  + b'] /Count %d >>' % len(page_numbers))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+
+    Path(path).write_bytes(bytes(output))
+
+
+def _rows_per_page() -> int:
+    return (PAGE_HEIGHT - TOP_MARGIN - BOTTOM_MARGIN) // LINE_HEIGHT
+
+
+def _split_pages(rows: list, pages: int) -> List[list]:
+    """Spread rows over the requested number of pages, but never overflow a page."""
+    pages = max(pages, -(-len(rows) // _rows_per_page()), 1)
+    per_page = -(-len(rows) // pages)
+    return [rows[i:i + per_page] for i in range(0, len(rows), per_page)] or [[]]
+
+
+def generate_ica(path: str, items: int = 20, discounts: int = 2, pages: int = 1,
+                 date: str = '2025-09-17', seed: int = 0) -> ReceiptSpec:
+    """Write an ICA receipt with a ruled item table, and return what it contains."""
+    rng = random.Random(seed)
+    spec = ReceiptSpec('ICA', date, pages=pages)
+
+    rows = []
+    for i in range(items):
+        name = rng.choice(PRODUCTS)
+        unit_ore = rng.randint(500, 9900)
+        quantity = rng.choice([1, 1, 1, 2, 3])
+        amount = unit_ore * quantity
+        rows.append([name, str(7310000000000 + rng.randint(0, 9999999)), format_amount(unit_ore),
+                     f"{quantity},00 st", format_amount(amount)])
+        spec.lines.append((name, amount))
+
+        if i < discounts:
+            reduction = -rng.randint(100, min(amount, 2000))
+            rows.append([f"Rabatt {name}", '', format_amount(reduction), '', format_amount(reduction)])
+            spec.lines.append((f"Rabatt {name}", reduction))
+
+    header = ['Beskrivning', 'Artikelnummer', 'Pris', 'Mängd', 'Summa']
+    columns = [40, 230, 330, 400, 470, 550]
+    rendered_pages = []
+    page_rows = _split_pages(rows, pages)
+
+    for page_index, rows_on_page in enumerate(page_rows):
+        operations = []
+        y = PAGE_HEIGHT - TOP_MARGIN
+        if page_index == 0:
+            operations.append(('text', columns[0], y, 'ICA Supermarket Brommaplan'))
+            operations.append(('text', columns[0], y - LINE_HEIGHT, f"Datum {date} Kl 17:42"))
+            y -= 3 * LINE_HEIGHT
+
+        # Each page repeats the header row, and the table is ruled so pdfplumber finds it
+        table_top = y + LINE_HEIGHT - 3
+        for row in [header] + rows_on_page:
+            operations.append(('line', columns[0], y + LINE_HEIGHT - 3, columns[-1], y + LINE_HEIGHT - 3))
+            for x, cell in zip(columns, row):
+                operations.append(('text', x + 3, y, cell))
+            y -= LINE_HEIGHT
+        operations.append(('line', columns[0], y + LINE_HEIGHT - 3, columns[-1], y + LINE_HEIGHT - 3))
+        for x in columns:
+            operations.append(('line', x, table_top, x, y + LINE_HEIGHT - 3))
+
+        if page_index == len(page_rows) - 1:
+            y -= LINE_HEIGHT
+            operations.append(('text', columns[0], y, f"Betalat {format_amount(spec.total_ore)}"))
+            operations.append(('text', columns[0], y - LINE_HEIGHT, f"Moms 12,00 {format_amount(spec.total_ore * 12 // 112)}"))
+            operations.append(('text', columns[0], y - 2 * LINE_HEIGHT, 'Kort Mastercard'))
+
+        rendered_pages.append(operations)
+
+    spec.pages = len(rendered_pages)
+    write_pdf(path, rendered_pages)
+    return spec
+
+
+def generate_willys(path: str, items: int = 20, discounts: int = 2, pant: int = 2, weighted: int = 3,
+                    pages: int = 1, date: str = '2025-09-18', seed: int = 0) -> ReceiptSpec:
+    """Write a Willy's self-scanning receipt, and return what it contains."""
+    rng = random.Random(seed)
+    spec = ReceiptSpec('WILLYS', date, pages=pages)
+
+    lines = []
+    for i in range(items):
+        if i < weighted:
+            name = rng.choice(WEIGHTED_PRODUCTS).upper()
+            grams = rng.randint(100, 2000)
+            price_per_kg = rng.randint(1990, 49900)
+            amount = grams * price_per_kg // 1000
+            calculation = f"{grams // 1000},{grams % 1000:03d}kg*{format_amount(price_per_kg)}kr/kg"
+            if i % 2 == 0:
+                # Name on its own line, weight calculation and price on the next
+                lines.append(name)
+                lines.append(f"{calculation} {format_amount(amount)}")
+            else:
+                lines.append(f"{name} {calculation} {format_amount(amount)}")
+        else:
+            name = rng.choice(PRODUCTS).upper()
+            quantity = rng.choice([1, 1, 1, 2, 4])
+            unit_ore = rng.randint(500, 9900)
+            amount = unit_ore * quantity
+            if quantity > 1:
+                lines.append(f"{name} {quantity}st*{format_amount(unit_ore)} {format_amount(amount)}")
+            else:
+                lines.append(f"{name} {format_amount(amount)}")
+        spec.lines.append((name, amount))
+
+        if i < discounts:
+            reduction = -rng.randint(100, min(amount, 2000))
+            lines.append(f"Rabatt:{name} {format_amount(reduction)}")
+            spec.lines.append((name, reduction))
+
+    for i in range(pant):
+        name, amount = PANT_LINES[i % len(PANT_LINES)]
+        lines.append(f"{name} {format_amount(amount)}")
+        spec.lines.append((name, amount))
+
+    lines = (['Willys Hemma Sundbyberg', f"{date} 17:45", 'Start Självscanning']
+             + lines
+             + ['Slut Självscanning', f"Totalt {format_amount(spec.total_ore)} SEK", 'Mottaget Kort 1'])
+
+    rendered_pages = []
+    for lines_on_page in _split_pages(lines, pages):
+        y = PAGE_HEIGHT - TOP_MARGIN
+        operations = []
+        for line in lines_on_page:
+            operations.append(('text', 40, y, line))
+            y -= LINE_HEIGHT
+        rendered_pages.append(operations)
+
+    spec.pages = len(rendered_pages)
+    write_pdf(path, rendered_pages)
+    return spec
+
+
+def generate_receipt(path: str, store: str, **options) -> ReceiptSpec:
+    """Write a receipt for the given store ('ICA' or 'WILLYS')."""
+    if store == 'ICA':
+        options.pop('pant', None)
+        options.pop('weighted', None)
+        return generate_ica(path, **options)
+    elif store == 'WILLYS':
+        return generate_willys(path, **options)
+    raise ValueError(f"Unknown store type '{store}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic ICA and Willys receipt PDFs')
+    parser.add_argument('--store', required=True, choices=['ICA', 'WILLYS'], help='Store layout to generate')
+    parser.add_argument('--items', type=int, default=20, help='Number of item lines (default: 20)')
+    parser.add_argument('--discounts', type=int, default=2, help='Number of discount lines (default: 2)')
+    parser.add_argument('--pant', type=int, default=2, help='Number of +PANT lines, Willys only (default: 2)')
+    parser.add_argument('--weighted', type=int, default=3, help='Number of kg*kr/kg lines, Willys only (default: 3)')
+    parser.add_argument('--pages', type=int, default=1, help='Minimum number of pages (default: 1)')
+    parser.add_argument('--count', type=int, default=1, help='Number of receipts to write (default: 1)')
+    parser.add_argument('--date', default='2025-09-17', help='Receipt date, YYYY-MM-DD (default: 2025-09-17)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--output', default='.', help='Directory to write the PDFs to (default: current directory)')
+
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    prefix = 'ICA Supermarket Brommaplan' if args.store == 'ICA' else 'Willys Hemma Sundbyberg'
+
+    for i in range(args.count):
+        suffix = f" {i + 1}" if args.count > 1 else ""
+        path = output / f"{prefix} {args.date}{suffix}.pdf"
+        spec = generate_receipt(str(path), args.store, items=args.items, discounts=args.discounts, pant=args.pant,
+                                weighted=args.weighted, pages=args.pages, date=args.date, seed=args.seed + i)
+        print(f"Wrote {path}: {len(spec.lines)} lines on {spec.pages} page(s), total {spec.total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ YEAR=""
 MONTH=""
 AFTER_DAY=""
 SPREADSHEET_ID=""
-STORE=""
+STORE="auto"
 
 while [[ $# -gt 0 ]]; do
   case $1 in
@@ -37,18 +37,20 @@ while [[ $# -gt 0 ]]; do
 done
 
 # Validate required arguments
-if [[ -z "$YEAR" || -z "$MONTH" || -z "$AFTER_DAY" || -z "$SPREADSHEET_ID" || -z "$STORE" ]]; then
-  echo "Usage: $0 --year YYYY --month MM --after-day DD --spreadsheet-id ID --store STORE_NAME"
+if [[ -z "$YEAR" || -z "$MONTH" || -z "$AFTER_DAY" || -z "$SPREADSHEET_ID" ]]; then
+  echo "Usage: $0 --year YYYY --month MM --after-day DD --spreadsheet-id ID [--store STORE_NAME|auto]"
   echo "Example: $0 --year 2026 --month 04 --after-day 07 --spreadsheet-id 1azIe-VlxovmI8CrRMUj6LeJeprJMPoCQvI-tTAPwHxA --store ICA"
   exit 1
 fi
 
-for f in bills/ICA\ Supermarket\ Brommaplan\ ${YEAR}-${MONTH}-*.pdf; do
-  # -6 means start 6 characters from the end of the filename, 2 means extract 2 characters, thus the day (DD) is extracted from a filename of form <*DD.pdf>
-  dd="${f: -6:2}" 
-  if [[ "$dd" > "$AFTER_DAY" ]]; then
-    uv run python receipt_processor.py \
-      --spreadsheet-id "$SPREADSHEET_ID" \
-      "$f" --store="$STORE"
-  fi
-done
+# Receipts strictly after AFTER_DAY, i.e. from the following day onwards.
+# The bound is compared as a YYYY-MM-DD string, so day 32 simply matches nothing.
+FROM_DAY=$(printf '%02d' $((10#$AFTER_DAY + 1)))
+
+# One interpreter for the whole month: batch parses in parallel and authenticates once.
+# With the default --store auto, ICA and Willy's receipts are told apart per file.
+uv run python receipt_processor.py batch \
+  "bills/*${YEAR}-${MONTH}-*.pdf" \
+  --from "${YEAR}-${MONTH}-${FROM_DAY}" \
+  --spreadsheet-id "$SPREADSHEET_ID" \
+  --store="$STORE"
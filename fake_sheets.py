@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Google Sheets v4 API
+
+Keeps spreadsheets in memory and implements the calls receipt_processor.py
+makes: spreadsheets.get/create/batchUpdate and
+values.get/update/clear/append/batchUpdate/batchGet/batchClear. Latency, error
+rates and per-minute quotas can be injected, so batching, retries and
+concurrency changes to the upload path can be measured without credentials or
+network.
+
+It can be used in two ways:
+
+- In process, as the ``service`` of a ReceiptProcessor:
+
+      backend = FakeSheetsBackend(latency=0.05, error_rate=0.02)
+      processor = ReceiptProcessor(ICAParser(), 'ICA', service=FakeSheetsService(backend))
+
+- Over HTTP, so the real Google client library is exercised end to end:
+
+      uv run python fake_sheets.py --port 8765 --latency 0.05 --write-quota 60
+      uv run python receipt_processor.py receipt.pdf --store ICA \\
+          --spreadsheet-id fake --sheets-endpoint http://localhost:8765/
+
+Copyright (C) 2025 Basile
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_ROWS = 1000
+DEFAULT_COLUMNS = 26
+
+READ_METHODS = {'get', 'values.get', 'values.batchGet'}
+
+
+class FakeSheetsError(Exception):
+    """An API error, shaped like googleapiclient's HttpError (``resp.status``, ``resp.get()``)."""
+
+    class _Response(dict):
+        def __init__(self, status: int, headers: dict):
+            super().__init__(headers)
+            self.status = status
+            self.reason = ''
+
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.status_code = status
+        self.message = message
+        self.resp = self._Response(status, headers or {})
+
+
+def _http_error(status: int, message: str, headers: Optional[dict] = None) -> Exception:
+    """Build googleapiclient's own HttpError when it is installed, so callers can't tell the difference."""
+    try:
+        import httplib2
+        from googleapiclient.errors import HttpError
+    except ImportError:
+        return FakeSheetsError(status, message, headers)
+
+    body = json.dumps({'error': {'code': status, 'message': message}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': status, **(headers or {})}), body)
+
+
+def column_index(letters: str) -> int:
+    """Zero-based index of a column name, e.g. 'A' -> 0, 'AA' -> 26."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+
+def column_letters(index: int) -> str:
+    """Column name of a zero-based index, e.g. 26 -> 'AA'."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+_CELL = re.compile(r'^([A-Za-z]*)(\d*)$')
+_NUMBER = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+def parse_range(a1: str) -> Tuple[str, int, int, Optional[int], Optional[int]]:
+    """Parse an A1 range such as "'My tab'!A1:G10", "Tab!A:Z" or "Tab".
+
+    Returns:
+        (sheet title, first row, first column, last row, last column), zero-based
+        and inclusive; the last row/column is None when the range is unbounded
+    """
+    if '!' in a1:
+        title, cells = a1.rsplit('!', 1)
+    else:
+        title, cells = a1, ''
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+
+    if not cells:
+        return title, 0, 0, None, None
+
+    start, _, end = cells.partition(':')
+    start_match, end_match = _CELL.match(start), _CELL.match(end or start)
+    if not start_match or not end_match:
+        raise _http_error(400, f"Unable to parse range: {a1}")
+
+    first_col = column_index(start_match.group(1)) if start_match.group(1) else 0
+    first_row = int(start_match.group(2)) - 1 if start_match.group(2) else 0
+    last_col = column_index(end_match.group(1)) if end_match.group(1) else None
+    last_row = int(end_match.group(2)) - 1 if end_match.group(2) else None
+    if not end and start_match.group(1) and start_match.group(2):
+        # A single cell like "A1": the end is the start, but writes may extend from it
+        last_row, last_col = None, None
+    return title, first_row, first_col, last_row, last_col
+
+
+def cell_value(value, value_input_option: str = 'RAW'):
+    """Store a written value as Sheets would: numbers stay numbers, and with
+    USER_ENTERED numeric text becomes a number too."""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    value = str(value)
+    if value_input_option == 'USER_ENTERED' and _NUMBER.match(value):
+        return float(value) if '.' in value else int(value)
+    return value
+
+
+def formatted_value(value) -> str:
+    """Render a stored value as FORMATTED_VALUE reads return it."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def format_range(title: str, first_row: int, first_col: int, last_row: int, last_col: int) -> str:
+    quoted = "'" + title.replace("'", "''") + "'"
+    return f"{quoted}!{column_letters(first_col)}{first_row + 1}:{column_letters(last_col)}{last_row + 1}"
+
+
+class FakeSheetsBackend:
+    """In-memory spreadsheets with injectable latency, errors and quotas.
+
+    Args:
+        latency: Seconds added to every request
+        jitter: Extra random latency, up to this many seconds
+        error_rate: Probability that a request fails with a 503
+        read_quota / write_quota: Requests allowed per rolling minute before
+            returning 429 (None for unlimited)
+        seed: Seed for the random error and jitter generator
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 read_quota: Optional[int] = None, write_quota: Optional[int] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quotas = {'read': read_quota, 'write': write_quota}
+        self.spreadsheets: Dict[str, dict] = {}
+        self.calls: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {'quota': 0, 'injected': 0}
+        self._recent = {'read': deque(), 'write': deque()}
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._next_sheet_id = 1
+
+    # -- request handling -------------------------------------------------
+
+    def call(self, method: str, **kwargs):
+        """Run one API method with the injected latency, errors and quota."""
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+
+        if delay:
+            time.sleep(delay)
+
+        kind = 'read' if method in READ_METHODS else 'write'
+        with self._lock:
+            quota = self.quotas[kind]
+            if quota is not None:
+                now = time.monotonic()
+                recent = self._recent[kind]
+                while recent and now - recent[0] >= 60:
+                    recent.popleft()
+                if len(recent) >= quota:
+                    self.rejected['quota'] += 1
+                    raise _http_error(429, f"Quota exceeded for quota metric '{kind.title()} requests'",
+                                      {'retry-after': str(max(1, int(60 - (now - recent[0]))))})
+                recent.append(now)
+
+            if fail:
+                self.rejected['injected'] += 1
+                raise _http_error(503, "The service is currently unavailable.")
+
+            handler = getattr(self, '_' + method.replace('.', '_'))
+            return copy.deepcopy(handler(**kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'calls': dict(self.calls), 'rejected': dict(self.rejected),
+                    'total_calls': sum(self.calls.values())}
+
+    # -- helpers ----------------------------------------------------------
+
+    def _spreadsheet(self, spreadsheet_id: str) -> dict:
+        if spreadsheet_id not in self.spreadsheets:
+            raise _http_error(404, f"Requested entity was not found: {spreadsheet_id}")
+        return self.spreadsheets[spreadsheet_id]
+
+    def _sheet(self, spreadsheet_id: str, title: str) -> dict:
+        for sheet in self._spreadsheet(spreadsheet_id)['sheets']:
+            if sheet['properties']['title'] == title:
+                return sheet
+        raise _http_error(400, f"Unable to parse range: {title}")
+
+    def _new_sheet(self, properties: dict) -> dict:
+        grid = properties.get('gridProperties', {})
+        sheet_id = properties.get('sheetId', self._next_sheet_id)
+        self._next_sheet_id = max(self._next_sheet_id, sheet_id) + 1
+        return {
+            'properties': {
+                'sheetId': sheet_id,
+                'title': properties.get('title', f"Sheet{sheet_id}"),
+                'index': properties.get('index', 0),
+                'sheetType': 'GRID',
+                'gridProperties': {'rowCount': grid.get('rowCount', DEFAULT_ROWS),
+                                   'columnCount': grid.get('columnCount', DEFAULT_COLUMNS)},
+            },
+            'values': [],
+        }
+
+    def create_spreadsheet(self, title: str = 'Untitled spreadsheet', spreadsheet_id: Optional[str] = None,
+                           sheet_titles: Tuple[str, ...] = ('Sheet1',)) -> str:
+        """Create a spreadsheet directly, e.g. to seed a test run. Returns its ID."""
+        body = {'properties': {'title': title}, 'sheets': [{'properties': {'title': t}} for t in sheet_titles]}
+        with self._lock:
+            return self._create(body, spreadsheet_id)['spreadsheetId']
+
+    def _write(self, sheet: dict, first_row: int, first_col: int, rows: List[list], extend: bool = False,
+               value_input_option: str = 'RAW') -> Tuple[int, int]:
+        grid = sheet['properties']['gridProperties']
+        width = max((len(row) for row in rows), default=0)
+        last_row = first_row + len(rows) - 1
+        last_col = first_col + width - 1
+
+        if last_row >= grid['rowCount'] or last_col >= grid['columnCount']:
+            if not extend:
+                raise _http_error(400, f"Range ({sheet['properties']['title']}!{column_letters(last_col)}{last_row + 1}) "
+                                       f"exceeds grid limits. Max rows: {grid['rowCount']}, max columns: {grid['columnCount']}")
+            grid['rowCount'] = max(grid['rowCount'], last_row + 1)
+            grid['columnCount'] = max(grid['columnCount'], last_col + 1)
+
+        values = sheet['values']
+        for offset, row in enumerate(rows):
+            index = first_row + offset
+            while len(values) <= index:
+                values.append([])
+            target = values[index]
+            while len(target) < first_col + len(row):
+                target.append('')
+            for column, value in enumerate(row):
+                target[first_col + column] = cell_value(value, value_input_option)
+        return last_row, last_col
+
+    @staticmethod
+    def _trim(rows: List[list]) -> List[list]:
+        rows = [list(row) for row in rows]
+        for row in rows:
+            while row and row[-1] == '':
+                row.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _read(self, spreadsheet_id: str, a1: str, value_render_option: str = 'FORMATTED_VALUE') -> dict:
+        title, first_row, first_col, last_row, last_col = parse_range(a1)
+        sheet = self._sheet(spreadsheet_id, title)
+        rows = sheet['values'][first_row:None if last_row is None else last_row + 1]
+        rows = [row[first_col:None if last_col is None else last_col + 1] for row in rows]
+        if value_render_option == 'FORMATTED_VALUE':
+            # Formulas aren't evaluated, so FORMATTED_VALUE and FORMULA differ only in number types
+            rows = [[formatted_value(value) for value in row] for row in rows]
+        result = {'range': a1, 'majorDimension': 'ROWS'}
+        trimmed = self._trim(rows)
+        if trimmed:
+            result['values'] = trimmed
+        return result
+
+    def _clear_range(self, spreadsheet_id: str, a1: str) -> str:
+        title, first_row, first_col, last_row, last_col = parse_range(a1)
+        sheet = self._sheet(spreadsheet_id, title)
+        for row in sheet['values'][first_row:None if last_row is None else last_row + 1]:
+            for column in range(first_col, len(row) if last_col is None else min(len(row), last_col + 1)):
+                row[column] = ''
+        return a1
+
+    # -- spreadsheets -----------------------------------------------------
+
+    def _get(self, spreadsheetId: str, fields: Optional[str] = None, **_) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheetId)
+        sheets = [{'properties': sheet['properties']} for sheet in spreadsheet['sheets']]
+        if fields and fields.startswith('sheets.properties(') and fields.endswith(')'):
+            # Honour the field masks receipt_processor.py uses, e.g. sheets.properties(title,sheetId)
+            wanted = set(fields[len('sheets.properties('):-1].split(','))
+            return {'sheets': [{'properties': {k: v for k, v in s['properties'].items() if k in wanted}}
+                               for s in sheets]}
+        return {'spreadsheetId': spreadsheetId, 'properties': spreadsheet['properties'], 'sheets': sheets,
+                'spreadsheetUrl': f"https://docs.google.com/spreadsheets/d/{spreadsheetId}/edit"}
+
+    def _create(self, body: dict, spreadsheet_id: Optional[str] = None, **_) -> dict:
+        spreadsheet_id = spreadsheet_id or uuid.uuid4().hex
+        sheets = [self._new_sheet(sheet.get('properties', {})) for sheet in body.get('sheets', [])] \
+            or [self._new_sheet({'title': 'Sheet1'})]
+        self.spreadsheets[spreadsheet_id] = {
+            'properties': {'title': 'Untitled spreadsheet', **body.get('properties', {})},
+            'sheets': sheets,
+        }
+        return self._get(spreadsheet_id)
+
+    def _batchUpdate(self, spreadsheetId: str, body: dict, **_) -> dict:
+        spreadsheet = self._spreadsheet(spreadsheetId)
+        replies = []
+        for request in body.get('requests', []):
+            if 'addSheet' in request:
+                properties = request['addSheet'].get('properties', {})
+                if any(s['properties']['title'] == properties.get('title') for s in spreadsheet['sheets']):
+                    raise _http_error(400, f"Invalid requests[0].addSheet: A sheet with the name "
+                                           f"\"{properties.get('title')}\" already exists.")
+                sheet = self._new_sheet({**properties, 'index': len(spreadsheet['sheets'])})
+                spreadsheet['sheets'].append(sheet)
+                replies.append({'addSheet': {'properties': sheet['properties']}})
+            elif 'deleteSheet' in request:
+                sheet_id = request['deleteSheet']['sheetId']
+                spreadsheet['sheets'] = [s for s in spreadsheet['sheets'] if s['properties']['sheetId'] != sheet_id]
+                replies.append({})
+            elif 'updateSheetProperties' in request:
+                update = request['updateSheetProperties']
+                for sheet in spreadsheet['sheets']:
+                    if sheet['properties']['sheetId'] == update['properties']['sheetId']:
+                        for key in update.get('fields', '').split(','):
+                            key = key.strip()
+                            if key.startswith('gridProperties.'):
+                                name = key.split('.', 1)[1]
+                                sheet['properties']['gridProperties'][name] = update['properties']['gridProperties'][name]
+                            elif key:
+                                sheet['properties'][key] = update['properties'][key]
+                replies.append({})
+            else:
+                raise _http_error(400, f"Unsupported request in fake Sheets API: {sorted(request)}")
+        return {'spreadsheetId': spreadsheetId, 'replies': replies}
+
+    # -- values -----------------------------------------------------------
+
+    def _values_get(self, spreadsheetId: str, range: str, valueRenderOption: str = 'FORMATTED_VALUE', **_) -> dict:
+        return self._read(spreadsheetId, range, valueRenderOption)
+
+    def _values_batchGet(self, spreadsheetId: str, ranges: List[str], valueRenderOption: str = 'FORMATTED_VALUE',
+                         **_) -> dict:
+        if isinstance(ranges, str):
+            ranges = [ranges]
+        return {'spreadsheetId': spreadsheetId,
+                'valueRanges': [self._read(spreadsheetId, r, valueRenderOption) for r in ranges]}
+
+    def _values_update(self, spreadsheetId: str, range: str, body: dict, valueInputOption: str = 'RAW', **_) -> dict:
+        title, first_row, first_col, _, _ = parse_range(range)
+        rows = body.get('values', [])
+        last_row, last_col = self._write(self._sheet(spreadsheetId, title), first_row, first_col, rows,
+                                         value_input_option=valueInputOption)
+        return {'spreadsheetId': spreadsheetId,
+                'updatedRange': format_range(title, first_row, first_col, last_row, last_col),
+                'updatedRows': len(rows), 'updatedColumns': last_col - first_col + 1,
+                'updatedCells': sum(len(row) for row in rows)}
+
+    def _values_batchUpdate(self, spreadsheetId: str, body: dict, **_) -> dict:
+        responses = [self._values_update(spreadsheetId, data['range'], {'values': data.get('values', [])},
+                                         body.get('valueInputOption', 'RAW'))
+                     for data in body.get('data', [])]
+        return {'spreadsheetId': spreadsheetId, 'responses': responses,
+                'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+                'totalUpdatedSheets': len({r['updatedRange'].rsplit('!', 1)[0] for r in responses})}
+
+    def _values_clear(self, spreadsheetId: str, range: str, **_) -> dict:
+        return {'spreadsheetId': spreadsheetId, 'clearedRange': self._clear_range(spreadsheetId, range)}
+
+    def _values_batchClear(self, spreadsheetId: str, body: dict, **_) -> dict:
+        return {'spreadsheetId': spreadsheetId,
+                'clearedRanges': [self._clear_range(spreadsheetId, r) for r in body.get('ranges', [])]}
+
+    def _values_append(self, spreadsheetId: str, range: str, body: dict, valueInputOption: str = 'RAW', **_) -> dict:
+        title, first_row, first_col, _, _ = parse_range(range)
+        sheet = self._sheet(spreadsheetId, title)
+        # Appends go below the last row that has any content
+        next_row = first_row
+        for index, row in enumerate(sheet['values']):
+            if index >= first_row and any(cell != '' for cell in row):
+                next_row = index + 1
+        rows = body.get('values', [])
+        last_row, last_col = self._write(sheet, next_row, first_col, rows, extend=True,
+                                         value_input_option=valueInputOption)
+        updated = format_range(title, next_row, first_col, last_row, last_col)
+        return {'spreadsheetId': spreadsheetId, 'tableRange': range,
+                'updates': {'spreadsheetId': spreadsheetId, 'updatedRange': updated, 'updatedRows': len(rows),
+                            'updatedColumns': last_col - first_col + 1,
+                            'updatedCells': sum(len(row) for row in rows)}}
+
+
+class _FakeRequest:
+    """Deferred call, executed like a googleapiclient HttpRequest."""
+
+    def __init__(self, backend: FakeSheetsBackend, method: str, kwargs: dict):
+        self._backend = backend
+        self.method = method
+        self.kwargs = kwargs
+
+    def execute(self, num_retries: int = 0):
+        return self._backend.call(self.method, **self.kwargs)
+
+
+class _ValuesResource:
+    def __init__(self, backend: FakeSheetsBackend):
+        self._backend = backend
+
+    def get(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.get', kwargs)
+
+    def batchGet(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.batchGet', kwargs)
+
+    def update(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.update', kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.batchUpdate', kwargs)
+
+    def clear(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.clear', kwargs)
+
+    def batchClear(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.batchClear', kwargs)
+
+    def append(self, **kwargs):
+        return _FakeRequest(self._backend, 'values.append', kwargs)
+
+
+class _SpreadsheetsResource:
+    def __init__(self, backend: FakeSheetsBackend):
+        self._backend = backend
+
+    def get(self, **kwargs):
+        return _FakeRequest(self._backend, 'get', kwargs)
+
+    def create(self, **kwargs):
+        return _FakeRequest(self._backend, 'create', kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return _FakeRequest(self._backend, 'batchUpdate', kwargs)
+
+    def values(self):
+        return _ValuesResource(self._backend)
+
+
+class FakeSheetsService:
+    """Drop-in for ``build('sheets', 'v4', ...)``, backed by a FakeSheetsBackend."""
+
+    def __init__(self, backend: Optional[FakeSheetsBackend] = None):
+        self.backend = backend or FakeSheetsBackend()
+
+    def spreadsheets(self):
+        return _SpreadsheetsResource(self.backend)
+
+
+def make_http_handler(backend: FakeSheetsBackend):
+    """Request handler serving the Sheets v4 REST paths from a backend."""
+    from http.server import BaseHTTPRequestHandler
+
+    spreadsheet_path = re.compile(r'^/v4/spreadsheets(?:/(?P<id>[^/:]+))?(?P<rest>.*)$')
+
+    class SheetsHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _respond(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _dispatch(self, http_method: str) -> None:
+            url = urlsplit(self.path)
+            query = {key: values if key == 'ranges' else values[0] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+            match = spreadsheet_path.match(url.path)
+            if not match:
+                self._respond(404, {'error': {'code': 404, 'message': f"Unknown path {url.path}"}})
+                return
+
+            spreadsheet_id, rest = match.group('id'), unquote(match.group('rest'))
+            kwargs = {'spreadsheetId': spreadsheet_id}
+            if spreadsheet_id is None and http_method == 'POST':
+                method, kwargs = 'create', {'body': body}
+            elif rest == '' and http_method == 'GET':
+                method = 'get'
+                kwargs['fields'] = query.get('fields')
+            elif rest == ':batchUpdate':
+                method, kwargs['body'] = 'batchUpdate', body
+            elif rest == '/values:batchGet':
+                method, kwargs['ranges'] = 'values.batchGet', query.get('ranges', [])
+                kwargs['valueRenderOption'] = query.get('valueRenderOption', 'FORMATTED_VALUE')
+            elif rest == '/values:batchUpdate':
+                method, kwargs['body'] = 'values.batchUpdate', body
+            elif rest == '/values:batchClear':
+                method, kwargs['body'] = 'values.batchClear', body
+            elif rest.startswith('/values/'):
+                a1 = rest[len('/values/'):]
+                kwargs['range'] = a1
+                if a1.endswith(':clear'):
+                    method, kwargs['range'] = 'values.clear', a1[:-len(':clear')]
+                elif a1.endswith(':append'):
+                    method, kwargs['range'], kwargs['body'] = 'values.append', a1[:-len(':append')], body
+                    kwargs['valueInputOption'] = query.get('valueInputOption', 'RAW')
+                elif http_method == 'PUT':
+                    method, kwargs['body'] = 'values.update', body
+                    kwargs['valueInputOption'] = query.get('valueInputOption', 'RAW')
+                else:
+                    method = 'values.get'
+                    kwargs['valueRenderOption'] = query.get('valueRenderOption', 'FORMATTED_VALUE')
+            else:
+                self._respond(404, {'error': {'code': 404, 'message': f"Unknown path {url.path}"}})
+                return
+
+            try:
+                self._respond(200, backend.call(method, **kwargs))
+            except Exception as e:
+                status = getattr(getattr(e, 'resp', None), 'status', 500)
+                headers = {'Retry-After': e.resp['retry-after']} if 'retry-after' in getattr(e, 'resp', {}) else None
+                message = getattr(e, 'message', None) or getattr(e, 'reason', None) or str(e)
+                self._respond(int(status), {'error': {'code': int(status), 'message': message}}, headers)
+
+        def do_GET(self):
+            self._dispatch('GET')
+
+        def do_POST(self):
+            self._dispatch('POST')
+
+        def do_PUT(self):
+            self._dispatch('PUT')
+
+    return SheetsHandler
+
+
+def serve(backend: FakeSheetsBackend, host: str = '127.0.0.1', port: int = 8765):
+    """Create a threaded HTTP server for the backend; call serve_forever() on the result."""
+    from http.server import ThreadingHTTPServer
+    return ThreadingHTTPServer((host, port), make_http_handler(backend))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local in-memory stand-in for the Google Sheets v4 API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, up to this many seconds (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 503 (default: 0)')
+    parser.add_argument('--read-quota', type=int, help='Read requests per minute before returning 429 (default: unlimited)')
+    parser.add_argument('--write-quota', type=int, help='Write requests per minute before returning 429 (default: unlimited)')
+    parser.add_argument('--spreadsheet-id', action='append', default=[],
+                        help='Pre-create an empty spreadsheet with this ID (repeatable; default: "fake")')
+
+    args = parser.parse_args()
+
+    backend = FakeSheetsBackend(args.latency, args.jitter, args.error_rate, args.read_quota, args.write_quota)
+    for spreadsheet_id in args.spreadsheet_id or ['fake']:
+        backend.create_spreadsheet(f"Fake {spreadsheet_id}", spreadsheet_id)
+
+    server = serve(backend, args.host, args.port)
+    print(f"Fake Sheets API listening on http://{args.host}:{args.port}/ "
+          f"(spreadsheets: {', '.join(backend.spreadsheets)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(backend.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
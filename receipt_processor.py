@@ -21,48 +21,367 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import subprocess
 import sys
+import os
 import re
+import glob
+import time
+import zlib
+import random
+import hashlib
+import sqlite3
 import argparse
+import threading
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
 import json
 import csv
-import pdfplumber
 from abc import ABC, abstractmethod
 
-try:
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-except ImportError:
-    print("Error: Google API client libraries not installed.")
-    print("""Install with:
-          uv add google-api-python-client google-auth-httplib2 google-auth-oauthlib
-          or
-          pip install google-api-python-client google-auth-httplib2 google-auth-oauthlib""")
-    sys.exit(1)
-
 
 # Google Sheets API scope
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
 
+class StageProfiler:
+    """Records wall-clock and CPU time for named processing stages.
+
+    Stages may nest. Each record carries its inclusive time and its self time
+    (excluding nested stages), so parser line classification can be told apart
+    from the pdfplumber extraction it triggers. ``on_stage`` is called with
+    every finished record, for callers that want to stream timings elsewhere.
+    """
+
+    def __init__(self, on_stage: Optional[Callable[[dict], None]] = None):
+        self.on_stage = on_stage
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str, **details):
+        """Time the enclosed block as stage ``name``; ``details`` are copied into the record."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        children = [0.0, 0.0]
+        stack.append(children)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+
+            record = {'stage': name, 'wall_s': wall, 'cpu_s': cpu,
+                      'self_wall_s': wall - children[0], 'self_cpu_s': cpu - children[1], **details}
+            with self._lock:
+                self.records.append(record)
+            if self.on_stage:
+                self.on_stage(record)
+
+    def report(self) -> dict:
+        """Per-stage totals plus the individual records."""
+        with self._lock:
+            records = list(self.records)
+        return {'stages': aggregate_stages(records), 'events': records}
+
+
+class NullProfiler(StageProfiler):
+    """Profiler that records nothing, used when profiling is off."""
+
+    def stage(self, name: str, **details):
+        return nullcontext()
+
+
+def aggregate_stages(records: List[dict]) -> Dict[str, dict]:
+    """Sum stage records by stage name."""
+    stages: Dict[str, dict] = {}
+    for record in records:
+        totals = stages.setdefault(record['stage'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                     'self_wall_s': 0.0, 'self_cpu_s': 0.0})
+        totals['count'] += 1
+        for key in ('wall_s', 'cpu_s', 'self_wall_s', 'self_cpu_s'):
+            totals[key] += record[key]
+    return stages
+
+
+def aggregate_reports(reports: List[dict]) -> Dict[str, dict]:
+    """Combine several StageProfiler reports, e.g. one per receipt in a batch."""
+    return aggregate_stages([record for report in reports for record in report['events']])
+
+
+def write_profile(report: dict, destination: str) -> None:
+    """Write a profile report as JSON to a file, or to stdout for '-'."""
+    text = json.dumps(report, indent=2)
+    if destination == '-':
+        print(text)
+    else:
+        with open(destination, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Wrote profile to {destination}")
+
+
+class ReceiptDocument:
+    """A receipt PDF opened once, with per-page text and tables extracted lazily.
+
+    Every parser method reads from the same document, so a receipt is opened and
+    laid out by pdfplumber only once no matter how many fields are extracted.
+
+    Pages are laid out one at a time: moving to another page releases the
+    layout objects of the previous one, so memory stays flat however long the
+    receipt is. Page text is kept since it is small; tables are not, so callers
+    should take everything they need from a page before moving on.
+    """
+
+    def __init__(self, pdf_path: str, profiler: Optional[StageProfiler] = None):
+        if not Path(pdf_path).exists():
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        self.pdf_path = pdf_path
+        self.profiler = profiler or NullProfiler()
+        self._pdf = None
+        self._texts: Dict[int, str] = {}
+        self._page = None
+
+    def __enter__(self) -> 'ReceiptDocument':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying PDF file."""
+        self.release_page()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    @property
+    def pdf(self):
+        """The pdfplumber PDF object, opened on first access."""
+        if self._pdf is None:
+            with self.profiler.stage('pdf_open'):
+                # Imported here so cached receipts never pay for loading pdfplumber
+                import pdfplumber
+                self._pdf = pdfplumber.open(self.pdf_path)
+                # Reading the page tree is part of opening; layout happens per page later
+                self._pdf.pages
+        return self._pdf
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pdf.pages)
+
+    def page(self, page_index: int):
+        """Return a pdfplumber page, releasing the layout of the previously used page."""
+        page = self.pdf.pages[page_index]
+        if self._page is not None and self._page is not page:
+            self.release_page()
+        self._page = page
+        return page
+
+    def release_page(self) -> None:
+        """Drop the cached layout objects of the current page."""
+        if self._page is not None:
+            self._page.close()
+            self._page = None
+
+    def page_text(self, page_index: int) -> str:
+        """Return the text of a page, extracting it on first access."""
+        if page_index not in self._texts:
+            page = self.page(page_index)
+            with self.profiler.stage('extract_text', page=page_index + 1):
+                self._texts[page_index] = page.extract_text() or ""
+        return self._texts[page_index]
+
+    def page_lines(self, page_index: int) -> List[str]:
+        """Return the non-empty, stripped text lines of a page."""
+        return [line.strip() for line in self.page_text(page_index).split('\n') if line.strip()]
+
+    def page_tables(self, page_index: int) -> List[List[List[str]]]:
+        """Return the tables found on a page. They are extracted again on every call."""
+        page = self.page(page_index)
+        with self.profiler.stage('extract_tables', page=page_index + 1):
+            return page.extract_tables()
+
+    def texts(self):
+        """Iterate over the text of every page."""
+        for page_index in range(self.page_count):
+            yield self.page_text(page_index)
+
+    def lines(self):
+        """Iterate over the non-empty text lines of every page."""
+        for page_index in range(self.page_count):
+            yield from self.page_lines(page_index)
+
+
+def parse_amount_ore(price: str) -> int:
+    """Convert a price such as '12.34', '-0,50' or '499' to an integer amount in öre."""
+    price = price.strip().replace(',', '.')
+    negative = price.startswith('-')
+    kronor, _, ore = price.lstrip('-').partition('.')
+    amount = int(kronor or 0) * 100 + int((ore + '00')[:2])
+    return -amount if negative else amount
+
+
+def format_ore(amount_ore: int) -> str:
+    """Format an amount in öre as a decimal string, e.g. -50 -> '-0.50'."""
+    sign = '-' if amount_ore < 0 else ''
+    kronor, ore = divmod(abs(amount_ore), 100)
+    return f"{sign}{kronor}.{ore:02d}"
+
+
+# "Pant" as a word, as in "+PANT BURK" or "Pant 1kr", but not "Pantene" or "PANTYLINER"
+PANT_PATTERN = re.compile(r'(?<![a-zåäö])pant(?![a-zåäö])', re.IGNORECASE)
+
+
+def line_kind(item: str, amount_ore: int, unit: str = "") -> str:
+    """Classify a receipt line as 'item', 'discount', 'pant' (bottle deposit) or 'weighted'."""
+    if amount_ore < 0:
+        return 'discount'
+    if PANT_PATTERN.search(item):
+        return 'pant'
+    if unit == 'kg':
+        return 'weighted'
+    return 'item'
+
+
+@dataclass(slots=True)
+class LineItem:
+    """One line of a receipt. Its price is parsed once, by the store parser, into integer öre."""
+    name: str
+    amount_ore: int
+    kind: str = 'item'  # 'item', 'discount', 'pant' or 'weighted'
+    quantity: Optional[float] = None  # pieces or kilograms, when the receipt shows them
+    unit: str = ""  # 'st' or 'kg'
+    unit_price_ore: Optional[int] = None
+
+    @classmethod
+    def from_price(cls, name: str, price: str, quantity: Optional[float] = None, unit: str = "",
+                   unit_price: Optional[str] = None, kind: Optional[str] = None) -> 'LineItem':
+        """Build a line from the price text found on the receipt, classifying its kind unless given."""
+        amount_ore = parse_amount_ore(price)
+        return cls(name, amount_ore, kind or line_kind(name, amount_ore, unit), quantity, unit,
+                   parse_amount_ore(unit_price) if unit_price else None)
+
+    @property
+    def price(self) -> str:
+        """The amount as a decimal string, e.g. '69.86'."""
+        return format_ore(self.amount_ore)
+
+    def to_list(self) -> list:
+        return [self.name, self.amount_ore, self.kind, self.quantity, self.unit, self.unit_price_ore]
+
+    @classmethod
+    def from_list(cls, values: list) -> 'LineItem':
+        return cls(*values)
+
+
+# "4st*11,90" or "0,140kg*499,00kr/kg": quantity, unit and unit price in front of a line's amount
+QUANTITY_PATTERN = re.compile(r'(\d+(?:[,.]\d+)?)\s*(st|kg)\s*\*\s*(\d+[,.]\d{2})', re.IGNORECASE)
+
+
+def parse_quantity(text: str) -> Tuple[Optional[float], str, Optional[str]]:
+    """Find a quantity, its unit and the unit price in a receipt line.
+
+    Returns:
+        (quantity, unit, unit price text), or (None, "", None) if there is none
+    """
+    match = QUANTITY_PATTERN.search(text)
+    if not match:
+        return None, "", None
+    return float(match.group(1).replace(',', '.')), match.group(2).lower(), match.group(3)
+
+
+@dataclass
+class ParsedReceipt:
+    """Everything a store parser extracts from one receipt."""
+    items: List[LineItem] = field(default_factory=list)
+    total: str = ""
+    date: str = ""
+
+    def to_dict(self) -> dict:
+        return {'items': [item.to_list() for item in self.items], 'total': self.total, 'date': self.date}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ParsedReceipt':
+        return cls(items=[LineItem.from_list(item) for item in data['items']], total=data['total'], date=data['date'])
+
+    @property
+    def items_total_ore(self) -> int:
+        return sum(item.amount_ore for item in self.items)
+
+    @property
+    def total_ore(self) -> Optional[int]:
+        """The total printed on the receipt in öre, or None if none was found."""
+        try:
+            return parse_amount_ore(self.total) if self.total else None
+        except ValueError:
+            return None
+
+    @property
+    def delta_ore(self) -> Optional[int]:
+        """Sum of the lines minus the printed total, or None if there is no total to compare with."""
+        total_ore = self.total_ore
+        return None if total_ore is None else self.items_total_ore - total_ore
+
+    @property
+    def reconciled(self) -> bool:
+        """True when the lines add up to the printed total to the öre."""
+        return self.delta_ore == 0
+
+    def reconciliation(self) -> str:
+        """Describe how the lines compare with the printed total, e.g. for a results line."""
+        delta_ore = self.delta_ore
+        if delta_ore is None:
+            return f"mismatched: items sum to {format_ore(self.items_total_ore)} but no total was found"
+        if delta_ore:
+            sign = '+' if delta_ore > 0 else ''
+            return (f"mismatched: items sum to {format_ore(self.items_total_ore)}, total is {self.total} "
+                    f"(delta {sign}{format_ore(delta_ore)})")
+        return f"reconciled: items sum to the total {format_ore(self.items_total_ore)}"
+
+
 class StoreParser(ABC):
-    """Abstract base class for store-specific receipt parsers."""
+    """Abstract base class for store-specific receipt parsers.
+
+    Subclasses implement the ``*_from_document`` methods, which read from an
+    already opened ``ReceiptDocument``. ``parse()`` extracts everything in one
+    pass; ``parse_items()``, ``extract_total()`` and ``extract_date()`` are kept
+    for callers that only have a path and need a single field.
+
+    Bump ``version`` whenever a change to the parser alters its output, so that
+    results cached by ``ExtractionCache`` under the old version are not reused.
+
+    ``fingerprint`` is a regular expression (matched case-insensitively) that
+    identifies the store in file names, PDF metadata or the start of the first
+    page, for ``--store auto``.
+    """
+
+    version = "3"
+    fingerprint: Optional[str] = None
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies this parser and its output format in the extraction cache."""
+        return f"{type(self).__name__}/{self.version}"
 
     @abstractmethod
-    def parse_items(self, pdf_path: str) -> List[Tuple[str, str]]:
-        """Extract items and their prices from the PDF.
+    def items_from_document(self, document: ReceiptDocument) -> List[LineItem]:
+        """Extract items and their prices from the document.
 
         Returns:
-            List of tuples (item_name, price)
+            One LineItem per receipt line, with its amount in öre
         """
         pass
 
     @abstractmethod
-    def extract_total(self, pdf_path: str) -> str:
-        """Extract the total amount paid from the PDF.
+    def total_from_document(self, document: ReceiptDocument) -> str:
+        """Extract the total amount paid from the document.
 
         Returns:
             Total amount as string (e.g., "123.45")
@@ -70,109 +389,124 @@ class StoreParser(ABC):
         pass
 
     @abstractmethod
-    def extract_date(self, pdf_path: str) -> str:
-        """Extract the date from the PDF.
+    def date_from_document(self, document: ReceiptDocument) -> str:
+        """Extract the date from the document.
 
         Returns:
             Date in YYYY-MM-DD format
         """
         pass
 
+    def parse(self, document: ReceiptDocument) -> ParsedReceipt:
+        """Extract items, total and date from an opened document.
+
+        Each field is a profiler stage; their self time is the parser's own line
+        classification, excluding the page extraction they trigger.
+        """
+        with document.profiler.stage('parse_items'):
+            items = self.items_from_document(document)
+        with document.profiler.stage('parse_total'):
+            total = self.total_from_document(document)
+        with document.profiler.stage('parse_date'):
+            date = self.date_from_document(document)
+        return ParsedReceipt(items=items, total=total, date=date)
+
+    def parse_items(self, pdf_path: str) -> List[LineItem]:
+        """Extract items and their prices from the PDF."""
+        with ReceiptDocument(pdf_path) as document:
+            return self.items_from_document(document)
+
+    def extract_total(self, pdf_path: str) -> str:
+        """Extract the total amount paid from the PDF."""
+        with ReceiptDocument(pdf_path) as document:
+            return self.total_from_document(document)
+
+    def extract_date(self, pdf_path: str) -> str:
+        """Extract the date from the PDF."""
+        with ReceiptDocument(pdf_path) as document:
+            return self.date_from_document(document)
+
 
 class ICAParser(StoreParser):
     """Parser for ICA receipts."""
 
-    def parse_items(self, pdf_path: str) -> List[Tuple[str, str]]:
+    version = "4"
+    fingerprint = r'(?<![a-zåäö])ica(?![a-zåäö])'
+
+    def items_from_document(self, document: ReceiptDocument) -> List[LineItem]:
         """Extract items and their prices from ICA PDF."""
-        table = self._extract_table_from_pdf(pdf_path)
+        table = self._extract_table_from_document(document)
         return self._process_receipt_table(table)
 
-    def extract_total(self, pdf_path: str) -> str:
+    def total_from_document(self, document: ReceiptDocument) -> str:
         """Extract the 'Betalat' (paid) total from ICA PDF."""
-        if not Path(pdf_path).exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-                        for line in lines:
-                            # Look for "Betalat" followed by amount
-                            if line.startswith('Betalat '):
-                                # Extract the amount after "Betalat "
-                                amount_str = line.replace('Betalat ', '').strip()
-                                # Convert comma to dot for decimal
-                                amount_clean = amount_str.replace(',', '.')
-                                # Validate it's a proper decimal number
-                                if re.match(r'^\d+\.\d{2}$', amount_clean):
-                                    return amount_clean
-
-                # If not found, return empty string
-                return ""
+            for line in document.lines():
+                # Look for "Betalat" followed by amount
+                if line.startswith('Betalat '):
+                    # Extract the amount after "Betalat "
+                    amount_str = line.replace('Betalat ', '').strip()
+                    # Convert comma to dot for decimal
+                    amount_clean = amount_str.replace(',', '.')
+                    # Validate it's a proper decimal number
+                    if re.match(r'^\d+\.\d{2}$', amount_clean):
+                        return amount_clean
+
+            # If not found, return empty string
+            return ""
 
         except Exception as e:
             print(f"Error extracting Betalat total from PDF: {e}")
             return ""
 
-    def extract_date(self, pdf_path: str) -> str:
+    def date_from_document(self, document: ReceiptDocument) -> str:
         """Extract the date from ICA PDF (format: YYYY-MM-DD)."""
-        if not Path(pdf_path).exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-                        for line in lines:
-                            # Look for "Datum" followed by date
-                            if 'Datum' in line:
-                                # Extract date in YYYY-MM-DD format
-                                date_match = re.search(r'(\d{4}-\d{2}-\d{2})', line)
-                                if date_match:
-                                    return date_match.group(1)
-
-                # If not found, return empty string
-                return ""
+            for line in document.lines():
+                # Look for "Datum" followed by date
+                if 'Datum' in line:
+                    # Extract date in YYYY-MM-DD format
+                    date_match = re.search(r'(\d{4}-\d{2}-\d{2})', line)
+                    if date_match:
+                        return date_match.group(1)
+
+            # If not found, return empty string
+            return ""
 
         except Exception as e:
             print(f"Error extracting date from PDF: {e}")
             return ""
 
-    def _extract_table_from_pdf(self, pdf_path: str) -> List[List[str]]:
-        """Extract table data from PDF using pdfplumber."""
-        if not Path(pdf_path).exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
+    def _extract_table_from_document(self, document: ReceiptDocument) -> List[List[str]]:
+        """Extract table data from the document's pages, one page at a time."""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                all_tables = []
-
-                for page in pdf.pages:
-                    # Try to extract tables
-                    tables = page.extract_tables()
-                    if tables:
-                        all_tables.extend(tables)
-
-                    # If no tables found, try to extract text and parse it
-                    if not tables:
-                        text = page.extract_text()
-                        if text:
-                            # Parse text for receipt structure
-                            parsed_table = self._parse_receipt_text(text)
-                            if parsed_table:
-                                all_tables.append(parsed_table)
-
-                if not all_tables:
-                    raise ValueError(f"No tables found in PDF: {pdf_path}")
-
-                # Return the largest table (likely the main receipt table)
-                return max(all_tables, key=len)
+            # Only the largest table so far (likely the main receipt table) is kept. Long receipts
+            # continue it on the next pages, each repeating the header row; those rows are appended.
+            best_table = None
+
+            for page_index in range(document.page_count):
+                # Try to extract tables
+                candidates = document.page_tables(page_index)
+
+                # Read the text while the page is laid out; the total and date are taken from it later
+                text = document.page_text(page_index)
+
+                # If no tables found, try to parse the text instead
+                if not candidates and text:
+                    parsed_table = self._parse_receipt_text(text)
+                    if parsed_table:
+                        candidates = [parsed_table]
+
+                for table in candidates:
+                    if best_table is not None and table and table[0] == best_table[0]:
+                        best_table = best_table + table[1:]
+                    elif best_table is None or len(table) > len(best_table):
+                        best_table = table
+
+            if best_table is None:
+                raise ValueError(f"No tables found in PDF: {document.pdf_path}")
+
+            return best_table
 
         except Exception as e:
             print(f"Error extracting table from PDF: {e}")
@@ -250,8 +584,8 @@ class ICAParser(StoreParser):
 
         return table_rows if len(table_rows) > 1 else []
 
-    def _process_receipt_table(self, table: List[List[str]]) -> List[Tuple[str, str]]:
-        """Process the extracted table to get item-price pairs."""
+    def _process_receipt_table(self, table: List[List[str]]) -> List[LineItem]:
+        """Process the extracted table to get one LineItem per row."""
         items_and_prices = []
 
         if not table or len(table) < 2:
@@ -261,6 +595,8 @@ class ICAParser(StoreParser):
         header_row = table[0]
         desc_col_idx = 0  # Default to first column
         price_col_idx = -1  # Default to last column
+        unit_price_col_idx = None
+        quantity_col_idx = None
 
         # Try to find specific columns
         for i, col in enumerate(header_row):
@@ -269,6 +605,10 @@ class ICAParser(StoreParser):
                 desc_col_idx = i
             elif 'summa' in col_lower:
                 price_col_idx = i
+            elif 'pris' in col_lower:
+                unit_price_col_idx = i
+            elif 'mängd' in col_lower:
+                quantity_col_idx = i
 
         # Process data rows (skip header)
         for row in table[1:]:
@@ -288,75 +628,91 @@ class ICAParser(StoreParser):
 
             # Validate price format (allow negative prices for reductions)
             if re.match(r'^-?\d+\.\d{2}$', price_clean):
-                items_and_prices.append((item_name, price_clean))
+                quantity, unit, unit_price = self._quantity_from_row(row, quantity_col_idx, unit_price_col_idx)
+                items_and_prices.append(LineItem.from_price(item_name, price_clean, quantity, unit, unit_price))
 
         return items_and_prices
 
+    def _quantity_from_row(self, row: List[str], quantity_col_idx: Optional[int],
+                           unit_price_col_idx: Optional[int]) -> Tuple[Optional[float], str, Optional[str]]:
+        """Read the "Mängd" (e.g. "2,00 st", "0,512 kg") and "Pris" cells of a table row, when present."""
+        if quantity_col_idx is None or quantity_col_idx >= len(row):
+            return None, "", None
+        match = re.match(r'^\s*(\d+(?:[,.]\d+)?)\s*(st|kg)\b', str(row[quantity_col_idx] or ''), re.IGNORECASE)
+        if not match:
+            return None, "", None
+
+        unit_price = None
+        if unit_price_col_idx is not None and unit_price_col_idx < len(row):
+            unit_price_match = re.match(r'^\s*(-?\d+[,.]\d{2})', str(row[unit_price_col_idx] or ''))
+            if unit_price_match:
+                unit_price = unit_price_match.group(1)
+        return float(match.group(1).replace(',', '.')), match.group(2).lower(), unit_price
+
 
 class WillysParser(StoreParser):
     """Parser for Willy's receipts."""
 
-    def parse_items(self, pdf_path: str) -> List[Tuple[str, str]]:
-        """Extract items and their prices from Willy's PDF."""
-        if not Path(pdf_path).exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    version = "4"
+    fingerprint = r'(?<![a-zåäö])willy\'?s(?![a-zåäö])|självscanning'
 
+    def items_from_document(self, document: ReceiptDocument) -> List[LineItem]:
+        """Extract items and their prices from Willy's PDF."""
         items_and_prices = []
 
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        lines = [line.strip() for line in text.split('\n') if line.strip()]
+            # The items section can continue over several pages
+            in_items_section = False
+            pending_item_name = None
+            for page_index in range(document.page_count):
+                lines = document.page_lines(page_index)
 
-                        in_items_section = False
-                        i = 0
-                        pending_item_name = None
+                i = 0
 
-                        while i < len(lines):
-                            line = lines[i]
+                while i < len(lines):
+                    line = lines[i]
 
-                            # Start of items section
-                            if 'Start Självscanning' in line or 'Start självscanning' in line:
-                                in_items_section = True
-                                i += 1
-                                continue
+                    # Start of items section
+                    if 'Start Självscanning' in line or 'Start självscanning' in line:
+                        in_items_section = True
+                        i += 1
+                        continue
 
-                            # End of items section
-                            if 'Slut Självscanning' in line or 'Slut självscanning' in line:
-                                in_items_section = False
-                                break
+                    # End of items section
+                    if 'Slut Självscanning' in line or 'Slut självscanning' in line:
+                        in_items_section = False
+                        break
+
+                    if not in_items_section:
+                        i += 1
+                        continue
+
+                    # Check if this is a weight calculation line (for multi-line items)
+                    # Format: "0,140kg*499,00kr/kg 69,86"
+                    if pending_item_name and re.match(r'^\d+[,\.]\d+kg\*', line):
+                        # Extract price from the end of the calculation line
+                        parts = line.split()
+                        if parts and re.match(r'^\d+[,\.]\d{2}$', parts[-1]):
+                            price = parts[-1].replace(',', '.')
+                            quantity, unit, unit_price = parse_quantity(line)
+                            items_and_prices.append(LineItem.from_price(pending_item_name, price, quantity, unit, unit_price))
+                            pending_item_name = None
+                            i += 1
+                            continue
 
-                            if not in_items_section:
-                                i += 1
-                                continue
-
-                            # Check if this is a weight calculation line (for multi-line items)
-                            # Format: "0,140kg*499,00kr/kg 69,86"
-                            if pending_item_name and re.match(r'^\d+[,\.]\d+kg\*', line):
-                                # Extract price from the end of the calculation line
-                                parts = line.split()
-                                if parts and re.match(r'^\d+[,\.]\d{2}$', parts[-1]):
-                                    price = parts[-1].replace(',', '.')
-                                    items_and_prices.append((pending_item_name, price))
-                                    pending_item_name = None
-                                    i += 1
-                                    continue
-
-                            # Parse item lines
-                            item_price = self._parse_willys_line(line)
-                            if item_price:
-                                items_and_prices.append(item_price)
-                                pending_item_name = None
-                            else:
-                                # This might be a multi-line item (name only, price on next line)
-                                # Check if the line looks like an item name (no price at the end)
-                                if not re.search(r'\d+[,\.]\d{2}$', line):
-                                    # Save it as a potential item name
-                                    pending_item_name = line.strip()
+                    # Parse item lines
+                    item_price = self._parse_willys_line(line)
+                    if item_price:
+                        items_and_prices.append(item_price)
+                        pending_item_name = None
+                    else:
+                        # This might be a multi-line item (name only, price on next line)
+                        # Check if the line looks like an item name (no price at the end)
+                        if not re.search(r'\d+[,\.]\d{2}$', line):
+                            # Save it as a potential item name
+                            pending_item_name = line.strip()
 
-                            i += 1
+                    i += 1
 
         except Exception as e:
             print(f"Error extracting items from Willy's PDF: {e}")
@@ -364,7 +720,7 @@ class WillysParser(StoreParser):
 
         return items_and_prices
 
-    def _parse_willys_line(self, line: str) -> Tuple[str, str] | None:
+    def _parse_willys_line(self, line: str) -> Optional[LineItem]:
         """Parse a single line from Willy's receipt."""
         # Skip empty lines
         if not line:
@@ -399,7 +755,7 @@ class WillysParser(StoreParser):
                     if not item_name:
                         item_name = "Prisnedsättning"
 
-                return (item_name, price)
+                return LineItem.from_price(item_name, price)
 
             return None
 
@@ -414,7 +770,7 @@ class WillysParser(StoreParser):
                     price = price_str.replace(',', '.')
                     # Item name is everything except the last element
                     item_name = ' '.join(parts[:-1])
-                    return (item_name, price)
+                    return LineItem.from_price(item_name, price, kind='pant')
             return None
 
         # Regular item lines
@@ -463,200 +819,1511 @@ class WillysParser(StoreParser):
 
             if item_parts:
                 item_name = ' '.join(item_parts)
-                return (item_name, price)
+                quantity, unit, unit_price = parse_quantity(' '.join(parts[item_end_idx:price_idx]))
+                return LineItem.from_price(item_name, price, quantity, unit, unit_price)
 
         return None
 
-    def extract_total(self, pdf_path: str) -> str:
+    def total_from_document(self, document: ReceiptDocument) -> str:
         """Extract the 'Totalt' (total) amount from Willy's PDF."""
-        if not Path(pdf_path).exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-                        for line in lines:
-                            # Look for "Totalt" followed by amount and SEK
-                            # Format: "Totalt 1043,88 SEK"
-                            if line.startswith('Totalt ') and 'SEK' in line:
-                                # Extract the amount between "Totalt " and " SEK"
-                                amount_str = line.replace('Totalt ', '').replace(' SEK', '').strip()
-                                # Convert comma to dot for decimal
-                                amount_clean = amount_str.replace(',', '.')
-                                # Validate it's a proper decimal number
-                                if re.match(r'^\d+\.\d{2}$', amount_clean):
-                                    return amount_clean
-
-                # If not found, return empty string
-                return ""
+            for line in document.lines():
+                # Look for "Totalt" followed by amount and SEK
+                # Format: "Totalt 1043,88 SEK"
+                if line.startswith('Totalt ') and 'SEK' in line:
+                    # Extract the amount between "Totalt " and " SEK"
+                    amount_str = line.replace('Totalt ', '').replace(' SEK', '').strip()
+                    # Convert comma to dot for decimal
+                    amount_clean = amount_str.replace(',', '.')
+                    # Validate it's a proper decimal number
+                    if re.match(r'^\d+\.\d{2}$', amount_clean):
+                        return amount_clean
+
+            # If not found, return empty string
+            return ""
 
         except Exception as e:
             print(f"Error extracting Totalt from Willy's PDF: {e}")
             return ""
 
-    def extract_date(self, pdf_path: str) -> str:
+    def date_from_document(self, document: ReceiptDocument) -> str:
         """Extract the date from Willy's PDF (format: YYYY-MM-DD)."""
-        if not Path(pdf_path).exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        # Look for date in format YYYY-MM-DD HH:MM
-                        date_match = re.search(r'(\d{4}-\d{2}-\d{2})\s+\d{2}:\d{2}', text)
-                        if date_match:
-                            return date_match.group(1)
-
-                # If not found, return empty string
-                return ""
+            for text in document.texts():
+                # Look for date in format YYYY-MM-DD HH:MM
+                date_match = re.search(r'(\d{4}-\d{2}-\d{2})\s+\d{2}:\d{2}', text)
+                if date_match:
+                    return date_match.group(1)
+
+            # If not found, return empty string
+            return ""
 
         except Exception as e:
             print(f"Error extracting date from Willy's PDF: {e}")
             return ""
 
 
-class ReceiptProcessor:
-    def __init__(self, store_parser: StoreParser, store_name: str, credentials_file: str = 'credentials.json', token_file: str = 'token.json'):
-        """Initialize the receipt processor with Google Sheets API credentials."""
-        self.store_parser = store_parser
-        self.store_name = store_name
+DEFAULT_CACHE_PATH = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'bills2sheet' / 'extractions.sqlite3'
+DEFAULT_CACHE_MAX_MB = 64
+
+
+class ExtractionCache:
+    """On-disk cache of parsed receipts, keyed by PDF content hash and parser version.
+
+    Results are stored zlib-compressed in SQLite. A (size, mtime) record per path
+    lets unchanged files skip hashing entirely. When the stored results exceed
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = str(DEFAULT_CACHE_PATH), max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Shared by the receipt server's job threads, so access is serialized by a lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                sha256 TEXT NOT NULL,
+                parser TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (sha256, parser)
+            );
+            CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+        """)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def file_hash(self, pdf_path: str) -> str:
+        """Return the SHA-256 of a file, reusing the stored hash if size and mtime are unchanged."""
+        with self._lock:
+            path = str(Path(pdf_path).resolve())
+            stat = os.stat(path)
+
+            row = self._conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                return row[2]
+
+            with open(path, 'rb') as f:
+                sha256 = hashlib.file_digest(f, 'sha256').hexdigest()
+
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                                   (path, stat.st_size, stat.st_mtime_ns, sha256))
+            return sha256
+
+    def get(self, pdf_path: str, parser_key: str) -> Optional[ParsedReceipt]:
+        """Return the cached result for a PDF, or None on a miss."""
+        with self._lock:
+            sha256 = self.file_hash(pdf_path)
+            row = self._conn.execute("SELECT payload FROM results WHERE sha256 = ? AND parser = ?",
+                                     (sha256, parser_key)).fetchone()
+            if not row:
+                return None
+
+            with self._conn:
+                self._conn.execute("UPDATE results SET last_used = ? WHERE sha256 = ? AND parser = ?",
+                                   (time.time(), sha256, parser_key))
+            return ParsedReceipt.from_dict(json.loads(zlib.decompress(row[0])))
+
+    def put(self, pdf_path: str, parser_key: str, receipt: ParsedReceipt) -> None:
+        """Store a parsed result and evict old entries if the cache is over budget."""
+        with self._lock:
+            sha256 = self.file_hash(pdf_path)
+            payload = zlib.compress(json.dumps(receipt.to_dict(), ensure_ascii=False).encode('utf-8'))
+
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (sha256, parser, payload, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (sha256, parser_key, payload, len(payload), time.time()))
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used results until the stored payloads fit in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = set()
+        for sha256, parser_key, size in self._conn.execute(
+                "SELECT sha256, parser, size FROM results ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE sha256 = ? AND parser = ?", (sha256, parser_key))
+            evicted.add(sha256)
+            total -= size
+
+        # Only forget the paths of evicted content; files hashed but not stored yet keep their fast path
+        for sha256 in evicted:
+            self._conn.execute("DELETE FROM files WHERE sha256 = ? AND NOT EXISTS "
+                               "(SELECT 1 FROM results WHERE results.sha256 = files.sha256)", (sha256,))
+
+
+# Sheets API quotas are per minute, per user per project: 60 reads and 60 writes.
+# The defaults stay a little below them so bursts don't tip over the limit.
+DEFAULT_READ_QUOTA = 55
+DEFAULT_WRITE_QUOTA = 55
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_minute // 6)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available.
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _http_status(error: Exception) -> Optional[int]:
+    """HTTP status of a googleapiclient HttpError, without importing googleapiclient."""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+class SheetsRequestScheduler:
+    """Single point through which every Sheets API request is executed.
+
+    Reads and writes each draw from a token bucket sized to the per-minute
+    quota. Rate-limit (429) and server (5xx) errors, and dropped connections,
+    are retried with jittered exponential backoff, honouring Retry-After when
+    the server sends it. It only paces requests: each upload path sends its
+    few batched requests one after another, so there is nothing to run in
+    parallel.
+
+    Requests that add something on every call (rows, spreadsheets, tabs) are
+    only retried after a 429: after a timeout or a 5xx the server may already
+    have applied them. Callers that can check what was applied retry those
+    themselves, see ReceiptProcessor._add_sheets().
+    """
+
+    READ_REQUESTS = {'get', 'values.get', 'values.batchGet'}
+    NON_IDEMPOTENT_REQUESTS = {'values.append', 'create', 'batchUpdate'}
+
+    def __init__(self, read_per_minute: float = DEFAULT_READ_QUOTA, write_per_minute: float = DEFAULT_WRITE_QUOTA,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 64.0):
+        self.buckets = {'read': TokenBucket(read_per_minute), 'write': TokenBucket(write_per_minute)}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.stats = {'read': 0, 'write': 0, 'retries': 0, 'throttled_s': 0.0, 'backoff_s': 0.0, 'errors': {}}
+
+    def execute(self, request, name: str):
+        """Execute a request under the quota, retrying transient failures."""
+        kind = 'read' if name in self.READ_REQUESTS else 'write'
+
+        for attempt in range(self.max_retries + 1):
+            waited = self.buckets[kind].acquire()
+            with self._lock:
+                self.stats[kind] += 1
+                self.stats['throttled_s'] += waited
+
+            try:
+                return request.execute()
+            except (ConnectionError, TimeoutError) as e:
+                status = None
+                error = e
+            except Exception as e:
+                status = _http_status(e)
+                if status not in RETRYABLE_STATUSES:
+                    raise
+                error = e
+
+            with self._lock:
+                key = str(status or type(error).__name__)
+                self.stats['errors'][key] = self.stats['errors'].get(key, 0) + 1
+            if attempt == self.max_retries or (name in self.NON_IDEMPOTENT_REQUESTS and status != 429):
+                raise error
+
+            delay = self._backoff_delay(attempt, error)
+            print(f"Sheets API {name} failed ({status or type(error).__name__}), retrying in {delay:.1f}s...")
+            with self._lock:
+                self.stats['retries'] += 1
+                self.stats['backoff_s'] += delay
+            time.sleep(delay)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if it gave one."""
+        resp = getattr(error, 'resp', None)
+        retry_after = resp.get('retry-after') if hasattr(resp, 'get') else None
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def report(self) -> dict:
+        """Quota consumption so far."""
+        with self._lock:
+            return {**self.stats, 'errors': dict(self.stats['errors'])}
+
+    def summary(self) -> str:
+        stats = self.report()
+        return (f"Sheets API: {stats['read']} read and {stats['write']} write requests, {stats['retries']} retries, "
+                f"{stats['throttled_s']:.1f}s waiting for quota, {stats['backoff_s']:.1f}s backing off")
+
+
+def sheet_range(sheet_name: str, cells: str) -> str:
+    """Build an A1 range on a named sheet, quoting the name as the Sheets API expects."""
+    return "'" + sheet_name.replace("'", "''") + "'!" + cells
+
+
+# Header of a receipt tab; C and D are filled in by hand to split the expenses
+SHEET_HEADER = ['Item', 'Shared expenses', 'My expenses', 'Jessica expenses', '', '', '']
+
+
+def sheet_item_name(name: str) -> str:
+    """Remove leading characters that Sheets would read as a formula."""
+    # Strip quotes first (from old escaping logic), then strip problematic characters
+    return name.lstrip("'").lstrip('+*=@-')
+
+
+def items_checksum(items: List[LineItem]) -> str:
+    """CRC-32 of the lines' names and amounts, e.g. to check that precomputed sums still match the items."""
+    lines = ''.join(f"{item.name}\t{item.amount_ore}\n" for item in items)
+    # Prefixed so that USER_ENTERED doesn't read an all-digit checksum as a number
+    return f"crc32:{zlib.crc32(lines.encode('utf-8')):08x}"
+
+
+def receipt_tab_grid(rows: List[list]) -> dict:
+    """Grid properties of a receipt tab holding exactly ``rows``, instead of the default 1000x26."""
+    return {'rowCount': len(rows), 'columnCount': SHEET_WIDTH}
+
+
+def receipt_sheet_rows(items: List[LineItem], pdf_total: str, precomputed: bool = False) -> List[list]:
+    """Lay out a receipt tab: the header, a summary block, a blank row, then one row per item.
+
+    The summary formulas only cover the item rows, e.g. ``=SUM(B8:B20)``, so
+    an edit recalculates the receipt's own rows instead of whole columns. With
+    ``precomputed``, the shared sum is written as a value, since this script
+    fills that column, and the blank row holds a checksum of the items it was
+    computed from; the hand-entered columns keep their bounded formulas.
+    """
+    # Items start below the header, five summary rows and a blank row (1-based)
+    first_row = 8
+    last_row = first_row + len(items) - 1
+
+    def column_sum(column: str) -> str:
+        return f'=SUM({column}{first_row}:{column}{last_row})' if items else '=0'
+
+    shared = sum(item.amount_ore for item in items) / 100 if precomputed else column_sum('B')
+    rows = [list(SHEET_HEADER)]
+    # Summary rows with labels in column F and sums in column G
+    rows.append(['', '', '', '', '', 'Sum of shared expenses', shared])
+    rows.append(['', '', '', '', '', 'Sum of my expenses', column_sum('C')])
+    rows.append(['', '', '', '', '', "Sum of Jessica's expenses", column_sum('D')])
+    rows.append(['', '', '', '', '', 'Sheet total', '=SUM(G2:G4)'])
+    rows.append(['', '', '', '', '', 'PDF total', parse_amount_ore(pdf_total) / 100 if pdf_total else ''])
+    rows.append(['', '', '', '', '', 'Items checksum', items_checksum(items)] if precomputed else [''] * 7)
+
+    for item in items:
+        # Amounts are sent as numbers, so Sheets doesn't re-parse them in the spreadsheet's locale
+        rows.append([sheet_item_name(item.name), item.amount_ore / 100, '', '', '', '', ''])
+    return rows
+
+
+@dataclass
+class SheetUpload:
+    """One receipt tab to be written by ReceiptProcessor.upload_sheets().
+
+    An ``auto_name`` (date and store) is only a starting point: upload_sheets()
+    replaces it with the receipt's recorded tab, or suffixes it if another
+    receipt's tab already has that name.
+    """
+    sheet_name: str
+    values: List[List[str]]
+    item_count: int
+    receipt_id: str = ""
+    auto_name: bool = False
+
+    @property
+    def first_item_row(self) -> int:
+        """Zero-based row of the first item; the item rows end the layout."""
+        return len(self.values) - self.item_count
+
+
+# Columns of a receipt tab written by this script; C and D hold the hand-entered expense split
+SHEET_COLUMNS = 'A:G'
+SHEET_WIDTH = 7
+SPLIT_COLUMNS = (2, 3)
+
+
+def match_item_rows(old_items: List[str], new_items: List[str]) -> List[Optional[int]]:
+    """Pair each new item row with the existing row it continues.
+
+    An item at the same position with the same name is kept first; other items
+    take the nearest unused existing row with the same name.
+
+    Returns:
+        For each new item, the index of its existing row, or None if it is new
+    """
+    matches = [None] * len(new_items)
+    for index, name in enumerate(new_items):
+        if index < len(old_items) and old_items[index] == name:
+            matches[index] = index
+    used = set(match for match in matches if match is not None)
+
+    unused_by_name: Dict[str, List[int]] = {}
+    for index, name in enumerate(old_items):
+        if index not in used:
+            unused_by_name.setdefault(name, []).append(index)
+    for index, name in enumerate(new_items):
+        candidates = unused_by_name.get(name)
+        if matches[index] is None and candidates:
+            nearest = min(candidates, key=lambda candidate: abs(candidate - index))
+            candidates.remove(nearest)
+            matches[index] = nearest
+    return matches
+
+
+def _pad_row(row: list) -> list:
+    return list(row[:SHEET_WIDTH]) + [''] * (SHEET_WIDTH - len(row))
+
+
+def merge_sheet_values(old_rows: List[list], upload: SheetUpload) -> Tuple[List[list], int]:
+    """Lay out a receipt over an existing tab, keeping the expense splits entered by hand.
+
+    Item rows take the split columns of the existing row they are matched with,
+    so a split stays with its item even if lines were added or removed above
+    it. Rows of the existing tab below the new layout are blanked.
+
+    Returns:
+        The rows to be on the tab, and how many items kept an existing split
+    """
+    old_rows = [_pad_row(row) for row in old_rows]
+    new_rows = [_pad_row(row) for row in upload.values]
+    first_item = upload.first_item_row
+
+    # Summary rows keep whatever was entered next to them; the header is always rewritten
+    for index in range(1, min(first_item, len(old_rows))):
+        for column in SPLIT_COLUMNS:
+            new_rows[index][column] = old_rows[index][column]
+
+    old_items = old_rows[first_item:]
+    matches = match_item_rows([row[0] for row in old_items], [row[0] for row in new_rows[first_item:]])
+    kept = 0
+    for row, match in zip(new_rows[first_item:], matches):
+        if match is None:
+            continue
+        for column in SPLIT_COLUMNS:
+            row[column] = old_items[match][column]
+        if any(old_items[match][column] != '' for column in SPLIT_COLUMNS):
+            kept += 1
+
+    new_rows.extend([''] * SHEET_WIDTH for _ in range(len(old_rows) - len(new_rows)))
+    return new_rows, kept
+
+
+def _same_cell(old, new) -> bool:
+    numbers = (int, float)
+    if isinstance(old, numbers) and isinstance(new, numbers) and not isinstance(old, bool):
+        return abs(old - new) < 1e-9
+    return str(old) == str(new)
+
+
+def changed_cell_ranges(sheet_name: str, old_rows: List[list], new_rows: List[list]) -> List[dict]:
+    """Value ranges covering only the cells that differ, one per run of changed cells in a row."""
+    data = []
+    for row_index, new_row in enumerate(new_rows):
+        old_row = _pad_row(old_rows[row_index]) if row_index < len(old_rows) else [''] * SHEET_WIDTH
+        column = 0
+        while column < SHEET_WIDTH:
+            if _same_cell(old_row[column], new_row[column]):
+                column += 1
+                continue
+            start = column
+            while column < SHEET_WIDTH and not _same_cell(old_row[column], new_row[column]):
+                column += 1
+            cells = f"{chr(ord('A') + start)}{row_index + 1}:{chr(ord('A') + column - 1)}{row_index + 1}"
+            data.append({'range': sheet_range(sheet_name, cells), 'values': [new_row[start:column]]})
+    return data
+
+
+# Columns of a monthly ledger tab; each receipt's lines are followed by one summary row
+LEDGER_HEADER = ['Date', 'Store', 'Receipt ID', 'Item', 'Shared expenses', 'My expenses', 'Jessica expenses', 'PDF total']
+LEDGER_COLUMNS = 'A:H'
+
+
+def ledger_sheet_name(receipt: ParsedReceipt) -> str:
+    """Name of the ledger tab for the receipt's month, e.g. 'Ledger 2026-05'."""
+    month = receipt.date[:7] if receipt.date else time.strftime('%Y-%m')
+    return f"Ledger {month}"
+
+
+def ledger_rows(rid: str, store: str, receipt: ParsedReceipt) -> List[list]:
+    """Lay out a receipt as ledger rows: one per line, then a summary row.
+
+    The summary sums the rows right above it through relative INDEX ranges, so
+    it stays correct wherever values.append puts the block and only ever reads
+    the receipt's own rows.
+    """
+    rows = []
+    for item in receipt.items:
+        rows.append([receipt.date, store, rid, sheet_item_name(item.name), item.amount_ore / 100, '', '', ''])
+
+    count = len(receipt.items)
+    if count:
+        sums = [f'=SUM(INDEX({column}:{column},ROW()-{count}):INDEX({column}:{column},ROW()-1))' for column in 'EFG']
+    else:
+        # A range of zero rows above would end at the summary cell itself
+        sums = [0, 0, 0]
+    total = receipt.total_ore
+    rows.append([receipt.date, store, rid, 'Receipt total', *sums, '' if total is None else total / 100])
+    return rows
+
+
+def receipt_id(pdf_path: str, cache: Optional[ExtractionCache] = None) -> str:
+    """Stable identifier of a receipt: the start of its PDF's SHA-256, so renames don't change it."""
+    if cache:
+        return cache.file_hash(pdf_path)[:16]
+    with open(pdf_path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()[:16]
+
+
+def receipt_rows(rid: str, store: str, receipt: ParsedReceipt) -> List[dict]:
+    """One typed row per receipt line, as written by the local sinks."""
+    return [{'receipt_id': rid, 'date': receipt.date or None, 'store': store, 'item': item.name,
+             'amount_ore': item.amount_ore, 'kind': item.kind} for item in receipt.items]
+
+
+class ReceiptSink(ABC):
+    """A local destination for parsed receipts, written in addition to or instead of Google Sheets.
+
+    Receipts are added one at a time and may be buffered; ``close()`` flushes
+    them. Sinks are used from a single process, which in batch runs is the
+    parent that collects the workers' results.
+    """
+
+    # Where the sink writes, for messages
+    path: str = ""
+
+    @abstractmethod
+    def add(self, rid: str, store: str, receipt: ParsedReceipt) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'ReceiptSink':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class CsvSink(ReceiptSink):
+    """One consolidated CSV of every line in a batch, with receipt columns on each row.
+
+    Rows are streamed to the file as receipts are added, through a large write
+    buffer, so memory doesn't grow with the batch. The file is opened in append
+    mode, which lets a monthly file collect several runs; the header is only
+    written to a new or empty file. Receipts whose ID is already in the file are
+    skipped, so re-running a month (or a PDF saved under two names) doesn't
+    duplicate lines. Data is fsynced once, on ``close()``.
+    """
+
+    HEADER = ['Receipt ID', 'Date', 'Store', 'Item', 'Price', 'Amount (öre)', 'Kind']
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self.receipts = 0
+        self.lines = 0
+        self.skipped = 0
+        self._existing = self._existing_ids()
+        self._file = open(path, 'a', newline='', encoding='utf-8', buffering=self.BUFFER_SIZE)
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(self.HEADER)
+
+    def _existing_ids(self) -> set:
+        """Receipt IDs already in the file, read in one streaming pass."""
+        try:
+            with open(self.path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header or header[0] != self.HEADER[0]:
+                    return set()
+                return {row[0] for row in reader if row}
+        except FileNotFoundError:
+            return set()
+
+    def add(self, rid: str, store: str, receipt: ParsedReceipt) -> None:
+        if rid in self._existing:
+            self.skipped += 1
+            return
+        self._existing.add(rid)
+        self._writer.writerows([rid, receipt.date, store, item.name, item.price, item.amount_ore, item.kind]
+                               for item in receipt.items)
+        self.receipts += 1
+        self.lines += len(receipt.items)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        print(f"Appended {self.lines} lines from {self.receipts} receipts to {self.path}")
+        if self.skipped:
+            print(f"Skipped {self.skipped} receipt(s) already in {self.path}")
+
+
+def _require_pyarrow() -> None:
+    """Exit with install instructions if pyarrow, only needed for the columnar sinks, is missing."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("Error: pyarrow is needed for --to-parquet and --to-arrow.")
+        print("""Install with:
+          uv sync --extra arrow
+          or
+          pip install pyarrow""")
+        sys.exit(1)
+
+
+class ArrowSink(ReceiptSink):
+    """Write receipt lines as typed columns: a partitioned Parquet dataset or one Arrow IPC file.
+
+    ``parquet`` mode appends one file per run to a Hive-partitioned dataset
+    (``year=2026/month=5/store=ICA/...``), skipping receipts whose ID is
+    already in it, so re-running a folder doesn't duplicate lines. ``arrow``
+    mode (re)writes a single Arrow IPC file with every line of the run.
+    """
+
+    PARTITIONS = ['year', 'month', 'store']
+
+    def __init__(self, path: str, file_format: str = 'parquet'):
+        _require_pyarrow()
+        self.path = path
+        self.file_format = file_format
+        self.rows: List[dict] = []
+        self.receipts = 0
+        self.skipped = 0
+        self._existing = self._existing_ids() if file_format == 'parquet' else set()
+
+    @property
+    def schema(self):
+        import pyarrow as pa
+
+        return pa.schema([
+            ('receipt_id', pa.string()),
+            ('date', pa.date32()),
+            ('store', pa.string()),
+            ('item', pa.string()),
+            ('amount_ore', pa.int64()),
+            ('kind', pa.dictionary(pa.int8(), pa.string())),
+            ('year', pa.int16()),
+            ('month', pa.int8()),
+        ])
+
+    def _existing_ids(self) -> set:
+        """Receipt IDs already in the dataset; reading one column of it is cheap."""
+        if not Path(self.path).is_dir():
+            return set()
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.path, format='parquet', partitioning='hive')
+        return set(dataset.to_table(columns=['receipt_id']).column('receipt_id').to_pylist())
+
+    def add(self, rid: str, store: str, receipt: ParsedReceipt) -> None:
+        if rid in self._existing:
+            self.skipped += 1
+            return
+        self._existing.add(rid)
+        self.receipts += 1
+        for row in receipt_rows(rid, store, receipt):
+            date = row['date'] if row['date'] and re.fullmatch(r'\d{4}-\d{2}-\d{2}', row['date']) else None
+            row['date'] = date
+            row['year'] = int(date[:4]) if date else None
+            row['month'] = int(date[5:7]) if date else None
+            self.rows.append(row)
+
+    def _table(self):
+        import datetime
+        import pyarrow as pa
+
+        rows = [dict(row, date=datetime.date.fromisoformat(row['date']) if row['date'] else None) for row in self.rows]
+        return pa.Table.from_pylist(rows, schema=self.schema)
+
+    def close(self) -> None:
+        if self.file_format == 'arrow':
+            import pyarrow.ipc as ipc
+
+            table = self._table()
+            with ipc.new_file(self.path, table.schema) as writer:
+                writer.write_table(table)
+            print(f"Wrote {table.num_rows} lines from {self.receipts} receipts to {self.path}")
+        elif self.rows:
+            import pyarrow.dataset as ds
+
+            partitioning = ds.partitioning(self.schema.empty_table().select(self.PARTITIONS).schema, flavor='hive')
+            ds.write_dataset(self._table(), self.path, format='parquet', partitioning=partitioning,
+                             basename_template=f"part-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{{i}}.parquet",
+                             existing_data_behavior='overwrite_or_ignore')
+            print(f"Appended {len(self.rows)} lines from {self.receipts} receipts to {self.path}")
+        if self.skipped:
+            print(f"Skipped {self.skipped} receipt(s) already in {self.path}")
+        self.rows = []
+
+
+def normalize_item_name(item: str) -> str:
+    """Lower-case an item name and collapse punctuation and spacing, for grouping the same product."""
+    return ' '.join(re.sub(r'[^\w%]+', ' ', item.casefold()).split())
+
+
+class LedgerSink(ReceiptSink):
+    """Local SQLite ledger of receipts and their line items.
+
+    Receipts are buffered and written in one transaction on ``close()`` with
+    ``executemany``. A receipt that is written again replaces its earlier rows,
+    so re-running a folder is safe. The database is in WAL mode, so it can be
+    queried while a batch is being ingested.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS receipts (
+                receipt_id TEXT PRIMARY KEY,
+                date TEXT,
+                store TEXT NOT NULL,
+                total_ore INTEGER,
+                item_count INTEGER NOT NULL,
+                added_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                receipt_id TEXT NOT NULL REFERENCES receipts (receipt_id),
+                line INTEGER NOT NULL,
+                item TEXT NOT NULL,
+                normalized_item TEXT NOT NULL,
+                amount_ore INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                PRIMARY KEY (receipt_id, line)
+            );
+            CREATE INDEX IF NOT EXISTS receipts_date ON receipts (date);
+            CREATE INDEX IF NOT EXISTS receipts_store ON receipts (store, date);
+            CREATE INDEX IF NOT EXISTS items_normalized_item ON items (normalized_item);
+        """)
+        # receipt ID -> (receipt row, item rows); a PDF copied under two names is written once
+        self.pending: Dict[str, Tuple[tuple, List[tuple]]] = {}
+
+    def add(self, rid: str, store: str, receipt: ParsedReceipt) -> None:
+        total_ore = parse_amount_ore(receipt.total) if receipt.total else None
+        items = [(rid, line, row['item'], normalize_item_name(row['item']), row['amount_ore'], row['kind'])
+                 for line, row in enumerate(receipt_rows(rid, store, receipt), start=1)]
+        self.pending[rid] = ((rid, receipt.date or None, store, total_ore, len(receipt.items), time.time()), items)
+
+    def close(self) -> None:
+        if self.pending:
+            receipts = [receipt for receipt, _ in self.pending.values()]
+            items = [item for _, receipt_items in self.pending.values() for item in receipt_items]
+            with self._conn:
+                self._conn.executemany("DELETE FROM items WHERE receipt_id = ?", [(rid,) for rid in self.pending])
+                self._conn.executemany("INSERT OR REPLACE INTO receipts (receipt_id, date, store, total_ore, item_count, added_at) "
+                                       "VALUES (?, ?, ?, ?, ?, ?)", receipts)
+                self._conn.executemany("INSERT INTO items (receipt_id, line, item, normalized_item, amount_ore, kind) "
+                                       "VALUES (?, ?, ?, ?, ?, ?)", items)
+            print(f"Wrote {len(items)} lines from {len(receipts)} receipts to {self.path}")
+            self.pending = {}
+        self._conn.close()
+
+
+DEFAULT_SHEET_INDEX_PATH = DEFAULT_CACHE_PATH.parent / 'spreadsheets.json'
+
+
+class SpreadsheetIndex:
+    """Local JSON index of rolled-over spreadsheets and of the spreadsheet holding each receipt.
+
+    A spreadsheet ID given on the command line names a chain: the spreadsheet
+    itself, then every spreadsheet created when the previous one reached the
+    cell budget. New receipts go to the last one; receipts already recorded go
+    back to the spreadsheet that holds them.
+    """
+
+    def __init__(self, path: str = str(DEFAULT_SHEET_INDEX_PATH)):
+        self.path = Path(path)
+        self.data = self._load()
+
+    def _load(self) -> dict:
+        data = {'rollovers': {}, 'receipts': {}}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: spreadsheet index {self.path} unreadable, starting a new one: {e}")
+        return data
+
+    def chain(self, spreadsheet_id: str) -> List[str]:
+        """The spreadsheet and its rollovers, oldest first."""
+        return [spreadsheet_id] + [entry['spreadsheet_id'] for entry in self.data['rollovers'].get(spreadsheet_id, [])]
+
+    def current(self, spreadsheet_id: str) -> str:
+        return self.chain(spreadsheet_id)[-1]
+
+    def spreadsheet_of(self, spreadsheet_id: str, rid: str, sheet_name: Optional[str] = None) -> Optional[str]:
+        """The spreadsheet of ``spreadsheet_id``'s chain that holds a receipt, if it was recorded (on ``sheet_name``)."""
+        entry = self.data['receipts'].get(rid) if rid else None
+        if entry and entry['spreadsheet_id'] in self.chain(spreadsheet_id) and sheet_name in (None, entry['sheet']):
+            return entry['spreadsheet_id']
+        return None
+
+    def add_rollover(self, spreadsheet_id: str, new_id: str, title: str) -> None:
+        self.data['rollovers'].setdefault(spreadsheet_id, []).append(
+            {'spreadsheet_id': new_id, 'title': title, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    def sheet_of(self, spreadsheet_id: str, rid: str) -> Optional[str]:
+        """The tab a receipt was written to in ``spreadsheet_id``'s chain, if it was recorded."""
+        if self.spreadsheet_of(spreadsheet_id, rid):
+            return self.data['receipts'][rid]['sheet']
+        return None
+
+    def record(self, rid: str, spreadsheet_id: str, sheet_name: str) -> None:
+        self.data['receipts'][rid] = {'spreadsheet_id': spreadsheet_id, 'sheet': sheet_name}
+
+    def save(self) -> None:
+        """Merge into the file on disk, so concurrent runs don't drop each other's entries, and replace it atomically."""
+        on_disk = self._load()
+        for spreadsheet_id, rollovers in self.data['rollovers'].items():
+            known = on_disk['rollovers'].setdefault(spreadsheet_id, [])
+            known_ids = {entry['spreadsheet_id'] for entry in known}
+            known.extend(entry for entry in rollovers if entry['spreadsheet_id'] not in known_ids)
+        on_disk['receipts'].update(self.data['receipts'])
+        self.data = on_disk
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=1, ensure_ascii=False)
+        os.replace(temporary, self.path)
+
+
+# Access tokens are refreshed this long before they expire (google-auth itself refreshes 3m45s ahead)
+TOKEN_REFRESH_MARGIN_S = 300
+
+
+class CredentialProvider:
+    """OAuth credentials for the Sheets API, shared by everything that uses one token file.
+
+    The access token is held in memory and refreshed shortly before it expires.
+    Refreshes are serialized across processes with a lock file next to the
+    token file, and the token file is read again once the lock is held: if
+    another process has just refreshed, its token is used instead of making a
+    second round trip. The token file is replaced atomically, so a reader never
+    sees it half-written.
+    """
+
+    def __init__(self, token_file: str = 'token.json', credentials_file: str = 'credentials.json',
+                 refresh_margin: float = TOKEN_REFRESH_MARGIN_S, profiler: Optional[StageProfiler] = None):
+        self.token_file = Path(token_file)
         self.credentials_file = credentials_file
-        self.token_file = token_file
-        self.service = None
-        
-    def authenticate_google_sheets(self) -> None:
-        """Authenticate with Google Sheets API."""
-        creds = None
-        
-        # Load existing token if available
-        if Path(self.token_file).exists():
-            creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
-        
-        # If no valid credentials, get new ones
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
+        self.refresh_margin = refresh_margin
+        self.profiler = profiler or NullProfiler()
+        self.lock_path = self.token_file.with_name(self.token_file.name + '.lock')
+        self._lock = threading.Lock()
+        self._stored = None
+
+    def credentials(self):
+        """Credentials for the Google client that get every new access token from this provider."""
+        from google.oauth2.credentials import Credentials
+
+        token, expiry = self.access_token()
+        # Without a refresh token, google-auth calls refresh_handler whenever the token is about to expire
+        return Credentials(token, expiry=expiry, scopes=SCOPES, refresh_handler=self._refresh_handler)
+
+    def _refresh_handler(self, request, scopes=None):
+        return self.access_token()
+
+    def access_token(self) -> tuple:
+        """Return an access token valid for at least ``refresh_margin`` seconds, and its expiry."""
+        with self._lock:
+            if self._stored is None or self._expires_soon(self._stored):
+                self._stored = self._fresh_credentials()
+            return self._stored.token, self._stored.expiry
+
+    def _expires_soon(self, creds) -> bool:
+        import datetime
+
+        if not creds.token or creds.expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (creds.expiry - now).total_seconds() < self.refresh_margin
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock shared by every process using this token file."""
+        try:
+            import fcntl
+        except ImportError:
+            # No fcntl on Windows: processes refresh independently, as before
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_token_file(self):
+        from google.oauth2.credentials import Credentials
+
+        if not self.token_file.exists():
+            return None
+        try:
+            return Credentials.from_authorized_user_file(str(self.token_file), SCOPES)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable token file {self.token_file}: {e}")
+            return None
+
+    def _write_token_file(self, creds) -> None:
+        temporary = self.token_file.with_name(f"{self.token_file.name}.{os.getpid()}.tmp")
+        with open(temporary, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(temporary, self.token_file)
+
+    def _fresh_credentials(self):
+        """Load, refresh or obtain credentials while holding the token file lock."""
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        with self._file_lock():
+            creds = self._read_token_file()
+            if creds and not self._expires_soon(creds):
+                # Still fresh, or just refreshed by another process
+                return creds
+
+            if creds and creds.refresh_token:
+                with self.profiler.stage('token_refresh'):
+                    creds.refresh(Request())
             else:
                 if not Path(self.credentials_file).exists():
                     print(f"Error: {self.credentials_file} not found.")
                     print("Download it from Google Cloud Console and place it in the script directory.")
                     sys.exit(1)
-                
+
                 flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, SCOPES)
                 creds = flow.run_local_server(port=0)
-            
-            # Save credentials for next run
-            with open(self.token_file, 'w') as token:
-                token.write(creds.to_json())
-        
-        self.service = build('sheets', 'v4', credentials=creds)
-    
-    def create_or_update_sheet(self, spreadsheet_id: str, sheet_name: str, data: List[Tuple[str, str]], pdf_path: str) -> None:
-        """Create or update a Google Sheet with the extracted data."""
-        if not self.service:
-            raise RuntimeError("Google Sheets service not initialized. Call authenticate_google_sheets() first.")
 
-        # Extract PDF total
-        pdf_total = self.store_parser.extract_total(pdf_path)
+            # Save credentials for the next run and for other processes
+            self._write_token_file(creds)
+            return creds
 
-        # Prepare data for Google Sheets (add headers with expense tracking columns)
-        sheet_data = [['Item', 'Shared expenses', 'My expenses', 'Jessica expenses', '', '', '']]
 
-        # Add summary rows before the data with labels in column F and formulas in column G
-        sheet_data.append(['', '', '', '', '', 'Sum of shared expenses', f'=SUM(B:B)'])
-        sheet_data.append(['', '', '', '', '', 'Sum of my expenses', f'=SUM(C:C)'])
-        sheet_data.append(['', '', '', '', '', "Sum of Jessica's expenses", f'=SUM(D:D)'])
-        sheet_data.append(['', '', '', '', '', 'Sheet total', '=SUM(G2:G4)'])
-        sheet_data.append(['', '', '', '', '', 'PDF total', pdf_total])
+# Sheets services built in this process, by (API endpoint, token file)
+_SHEETS_SERVICES: Dict[Tuple[str, str], object] = {}
+_SHEETS_SERVICES_LOCK = threading.Lock()
 
-        # Add empty row for separation
-        sheet_data.append(['', '', '', '', '', '', ''])
 
-        # Convert data to expanded format
-        for item, price in data:
-            # Remove leading special characters that might cause issues in Google Sheets
-            # Strip quotes first (from old escaping logic), then strip problematic characters
-            clean_item = item.lstrip("'").lstrip('+*=@-')
-            sheet_data.append([clean_item, price, '', '', '', '', ''])
-        
+def _thread_http_request_builder(credentials) -> Callable:
+    """Return a ``requestBuilder`` that sends each thread's requests over that thread's own connection.
+
+    httplib2.Http keeps connections open between requests but is not
+    thread-safe, so every thread gets one authorized Http object and reuses it:
+    consecutive requests skip the TCP and TLS handshakes.
+    """
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.http import HttpRequest, build_http
+
+    local = threading.local()
+
+    def request_builder(http, *args, **kwargs):
+        if getattr(local, 'http', None) is None:
+            local.http = AuthorizedHttp(credentials, http=build_http())
+        return HttpRequest(local.http, *args, **kwargs)
+
+    return request_builder
+
+
+def sheets_service(credentials, api_endpoint: Optional[str] = None, cache_key: Optional[str] = None):
+    """Build a Sheets v4 service from the discovery document bundled with the client library.
+
+    With a ``cache_key`` (the token file), the service is built once per process
+    and endpoint and reused by every later caller.
+    """
+    from googleapiclient.discovery import build
+
+    key = (api_endpoint or '', cache_key) if cache_key is not None else None
+    with _SHEETS_SERVICES_LOCK:
+        if key in _SHEETS_SERVICES:
+            return _SHEETS_SERVICES[key]
+        client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        service = build('sheets', 'v4', credentials=credentials, client_options=client_options,
+                        static_discovery=True, cache_discovery=False,
+                        requestBuilder=_thread_http_request_builder(credentials))
+        if key is not None:
+            _SHEETS_SERVICES[key] = service
+        return service
+
+
+class ReceiptProcessor:
+    def __init__(self, store_parser: StoreParser, store_name: str, credentials_file: str = 'credentials.json', token_file: str = 'token.json',
+                 cache: Optional[ExtractionCache] = None, refresh_cache: bool = False,
+                 profiler: Optional[StageProfiler] = None, scheduler: Optional[SheetsRequestScheduler] = None,
+                 service=None, sheets_endpoint: Optional[str] = None, diff_updates: bool = False,
+                 sheet_layout: str = 'tabs', precomputed_sums: bool = False,
+                 sheet_index: Optional[SpreadsheetIndex] = None, cell_budget: int = 0,
+                 credential_provider: Optional[CredentialProvider] = None):
+        """Initialize the receipt processor with Google Sheets API credentials.
+
+        With a ``cache``, parsed results are looked up by PDF content before
+        pdfplumber is touched; ``refresh_cache`` re-parses and overwrites them.
+        A ``profiler`` records the time spent in every processing stage, and all
+        Sheets API requests go through the quota-aware ``scheduler``.
+
+        A ready-made ``service`` (e.g. fake_sheets.FakeSheetsService) skips
+        authentication entirely; ``sheets_endpoint`` points the real client at
+        another server, such as ``fake_sheets.py``, with anonymous credentials.
+        With ``diff_updates``, existing tabs are updated cell by cell instead of
+        being cleared and rewritten. ``sheet_layout`` 'ledger' appends receipts to
+        one tab per month instead of giving each receipt its own tab, and
+        ``precomputed_sums`` writes the shared sum of a receipt tab as a value.
+        Once a spreadsheet's grids reach ``cell_budget`` cells, new receipts go to
+        a new spreadsheet; ``sheet_index`` remembers those and where each receipt is.
+        A ``credential_provider`` can be shared by several processors; by default
+        each one creates its own for ``token_file``.
+        """
+        self.profiler = profiler or NullProfiler()
+        self.scheduler = scheduler or SheetsRequestScheduler()
+        self.store_parser = store_parser
+        self.store_name = store_name
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.service = service
+        self.sheets_endpoint = sheets_endpoint
+        self.diff_updates = diff_updates
+        self.sheet_layout = sheet_layout
+        self.precomputed_sums = precomputed_sums
+        self.sheet_index = sheet_index
+        self.cell_budget = cell_budget
+        self.credential_provider = credential_provider
+        # spreadsheet ID -> {tab title: sheetId} and {tab title: (rows, columns)}, kept for the lifetime of the processor
+        self._sheet_ids: Dict[str, Dict[str, int]] = {}
+        self._sheet_grids: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    def parse_receipt(self, pdf_path: str) -> ParsedReceipt:
+        """Parse a receipt PDF, using the extraction cache when one is configured."""
+        if self.cache and not self.refresh_cache:
+            with self.profiler.stage('cache_lookup'):
+                cached = self.cache.get(pdf_path, self.store_parser.cache_key)
+            if cached is not None:
+                print("Using cached extraction (PDF unchanged since last run)")
+                return cached
+
+        with ReceiptDocument(pdf_path, self.profiler) as document:
+            receipt = self.store_parser.parse(document)
+
+        if self.cache:
+            with self.profiler.stage('cache_store'):
+                self.cache.put(pdf_path, self.store_parser.cache_key, receipt)
+        return receipt
+
+    def authenticate_google_sheets(self) -> None:
+        """Authenticate with Google Sheets API."""
+        if self.service is not None:
+            return
+
+        # The Google client stack is slow to import, so CSV-only runs never load it
         try:
-            # Check if sheet exists, create if it doesn't
-            spreadsheet = self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            sheet_exists = any(sheet['properties']['title'] == sheet_name for sheet in spreadsheet['sheets'])
-            
-            if not sheet_exists:
-                # Create the sheet
-                request_body = {
-                    'requests': [{
-                        'addSheet': {
-                            'properties': {
-                                'title': sheet_name
-                            }
-                        }
-                    }]
+            import googleapiclient.discovery  # noqa: F401
+            import google_auth_httplib2  # noqa: F401
+            import google_auth_oauthlib  # noqa: F401
+        except ImportError:
+            print("Error: Google API client libraries not installed.")
+            print("""Install with:
+          uv add google-api-python-client google-auth-httplib2 google-auth-oauthlib
+          or
+          pip install google-api-python-client google-auth-httplib2 google-auth-oauthlib""")
+            sys.exit(1)
+
+        if self.sheets_endpoint:
+            from google.auth.credentials import AnonymousCredentials
+
+            # Sheets method paths are relative ("v4/spreadsheets/..."), so the endpoint must end in a slash
+            endpoint = self.sheets_endpoint.rstrip('/') + '/'
+            with self.profiler.stage('discovery_build'):
+                self.service = sheets_service(AnonymousCredentials(), endpoint, cache_key='')
+            return
+
+        cached = _SHEETS_SERVICES.get(('', str(self.token_file)))
+        if cached is not None:
+            # Already authorized in this process; its credentials refresh themselves
+            self.service = cached
+            return
+
+        with self.profiler.stage('auth'):
+            if self.credential_provider is None:
+                self.credential_provider = CredentialProvider(self.token_file, self.credentials_file,
+                                                              profiler=self.profiler)
+            creds = self.credential_provider.credentials()
+
+        with self.profiler.stage('discovery_build'):
+            self.service = sheets_service(creds, cache_key=str(self.token_file))
+
+    def _execute(self, request, name: str):
+        """Execute a Sheets API request. Every API call goes through here, timed as stage ``sheets.<name>``."""
+        with self.profiler.stage(f'sheets.{name}'):
+            return self.scheduler.execute(request, name)
+
+    def build_sheet_data(self, data: List[LineItem], pdf_total: str) -> List[list]:
+        """Lay out a receipt as rows for a receipt tab."""
+        return receipt_sheet_rows(data, pdf_total, self.precomputed_sums)
+
+    def create_or_update_sheet(self, spreadsheet_id: str, sheet_name: str, data: List[LineItem], pdf_total: str,
+                               rid: str = "", auto_name: bool = False) -> str:
+        """Create or update a Google Sheet with the extracted data.
+
+        Returns:
+            The name of the tab that was written, which differs from ``sheet_name``
+            when an ``auto_name`` was taken by another receipt
+        """
+        upload = SheetUpload(sheet_name, self.build_sheet_data(data, pdf_total), len(data),
+                             receipt_id=rid, auto_name=auto_name)
+        self.upload_sheets(spreadsheet_id, [upload])
+        return upload.sheet_name
+
+    def _assign_tab_names(self, spreadsheet_id: str, uploads: List['SheetUpload']) -> None:
+        """Give each auto-named upload its recorded tab, or a name no other receipt's tab has.
+
+        Needs the spreadsheet index: without it there is no telling whose tab an
+        existing one is, so auto names are only made unique within the uploads.
+        """
+        taken = set()
+        if self.sheet_index:
+            for target in self.sheet_index.chain(spreadsheet_id):
+                taken.update(self.get_sheet_ids(target))
+
+        for upload in uploads:
+            if not upload.auto_name:
+                continue
+            recorded = self.sheet_index.sheet_of(spreadsheet_id, upload.receipt_id) if self.sheet_index else None
+            if recorded:
+                upload.sheet_name = recorded
+                continue
+
+            base_name = upload.sheet_name
+            suffix = 2
+            while upload.sheet_name in taken:
+                upload.sheet_name = f"{base_name} ({suffix})"
+                suffix += 1
+            taken.add(upload.sheet_name)
+
+    def upload_sheets(self, spreadsheet_id: str, uploads: List['SheetUpload']) -> None:
+        """Write any number of receipt tabs with a fixed number of API calls.
+
+        Missing tabs are created in one ``spreadsheets.batchUpdate``, all tabs are
+        cleared in one ``values.batchClear`` and written in one ``values.batchUpdate``,
+        however many receipts are uploaded. With ``diff_updates``, existing tabs are
+        read in one ``values.batchGet`` instead of being cleared, and only the cells
+        that changed are written, keeping the expense splits entered by hand.
+
+        Receipts already recorded in the spreadsheet index go back to the
+        spreadsheet and tab that hold them; new tabs go to the current spreadsheet of
+        ``spreadsheet_id``, which is rolled over once the cell budget is reached.
+        """
+        if not self.service:
+            raise RuntimeError("Google Sheets service not initialized. Call authenticate_google_sheets() first.")
+
+        if not uploads:
+            return
+
+        try:
+            self._assign_tab_names(spreadsheet_id, uploads)
+            current = self.current_spreadsheet(spreadsheet_id)
+            targets: Dict[str, List[SheetUpload]] = {}
+            new_tabs = []
+            for upload in uploads:
+                indexed = self.sheet_index.spreadsheet_of(spreadsheet_id, upload.receipt_id) if self.sheet_index else None
+                if indexed:
+                    targets.setdefault(indexed, []).append(upload)
+                elif upload.sheet_name in self.get_sheet_ids(current):
+                    targets.setdefault(current, []).append(upload)
+                else:
+                    new_tabs.append(upload)
+            if new_tabs:
+                new_cells = sum(len(upload.values) * SHEET_WIDTH for upload in new_tabs)
+                target = self.spreadsheet_with_room(spreadsheet_id, current, new_cells)
+                targets.setdefault(target, []).extend(new_tabs)
+
+            for target, target_uploads in targets.items():
+                self._write_tabs(target, target_uploads)
+                if self.sheet_index:
+                    for upload in target_uploads:
+                        if upload.receipt_id:
+                            self.sheet_index.record(upload.receipt_id, target, upload.sheet_name)
+                self._report_cells(target)
+
+        except Exception as e:
+            # The tabs may now differ from what we cached, so fetch them again next time
+            self.invalidate_sheet_ids()
+            print(f"Error updating Google Sheet: {e}")
+            sys.exit(1)
+        finally:
+            if self.sheet_index:
+                self.sheet_index.save()
+
+    def _write_tabs(self, spreadsheet_id: str, uploads: List['SheetUpload']) -> None:
+        """Create, size and write the receipt tabs of one spreadsheet."""
+        sheet_ids = self.get_sheet_ids(spreadsheet_id)
+        grids = self.get_sheet_grids(spreadsheet_id)
+
+        # New tabs get a grid sized to their rows instead of the default 1000x26, and
+        # existing tabs only grow when a receipt no longer fits
+        missing = [upload for upload in uploads if upload.sheet_name not in sheet_ids]
+        existing = [upload for upload in uploads if upload.sheet_name in sheet_ids]
+        requests = [{
+            'addSheet': {
+                'properties': {
+                    'title': upload.sheet_name,
+                    'gridProperties': receipt_tab_grid(upload.values)
                 }
-                self.service.spreadsheets().batchUpdate(
-                    spreadsheetId=spreadsheet_id,
-                    body=request_body
-                ).execute()
-                print(f"Created new sheet: {sheet_name}")
-            
-            # Clear the sheet
-            self.service.spreadsheets().values().clear(
+            }
+        } for upload in missing]
+        for upload in existing:
+            rows, columns = grids.get(upload.sheet_name, (0, 0))
+            if rows < len(upload.values) or columns < SHEET_WIDTH:
+                grids[upload.sheet_name] = (max(rows, len(upload.values)), max(columns, SHEET_WIDTH))
+                requests.append({
+                    'updateSheetProperties': {
+                        'properties': {
+                            'sheetId': sheet_ids[upload.sheet_name],
+                            'gridProperties': dict(zip(('rowCount', 'columnCount'), grids[upload.sheet_name]))
+                        },
+                        'fields': 'gridProperties.rowCount,gridProperties.columnCount'
+                    }
+                })
+        if requests:
+            self._add_sheets(spreadsheet_id, requests)
+            for upload in missing:
+                print(f"Created new sheet: {upload.sheet_name}")
+
+        if self.diff_updates:
+            self._update_changed_cells(spreadsheet_id, uploads, existing)
+            return
+
+        # Clear the sheets
+        self._execute(self.service.spreadsheets().values().batchClear(
+            spreadsheetId=spreadsheet_id,
+            body={'ranges': [sheet_range(upload.sheet_name, SHEET_COLUMNS) for upload in uploads]}
+        ), 'values.batchClear')
+
+        # Add new data
+        self._execute(self.service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': sheet_range(upload.sheet_name, 'A1'), 'values': upload.values}
+                         for upload in uploads]
+            }
+        ), 'values.batchUpdate')
+
+        for upload in uploads:
+            print(f"Successfully updated sheet '{upload.sheet_name}' with {upload.item_count} items, expense tracking columns, and summary calculations.")
+
+    def _update_changed_cells(self, spreadsheet_id: str, uploads: List['SheetUpload'],
+                              existing: List['SheetUpload']) -> None:
+        """Write only the cells of each tab that differ from what is already there."""
+        old_values = {}
+        if existing:
+            # FORMULA returns formulas as written and numbers unformatted, so they compare with the new layout
+            response = self._execute(self.service.spreadsheets().values().batchGet(
                 spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!A:Z"
-            ).execute()
-            
-            # Add new data
-            self.service.spreadsheets().values().update(
+                ranges=[sheet_range(upload.sheet_name, SHEET_COLUMNS) for upload in existing],
+                valueRenderOption='FORMULA'
+            ), 'values.batchGet')
+            for upload, value_range in zip(existing, response.get('valueRanges', [])):
+                old_values[upload.sheet_name] = value_range.get('values', [])
+
+        data = []
+        for upload in uploads:
+            old_rows = old_values.get(upload.sheet_name, [])
+            new_rows, kept = merge_sheet_values(old_rows, upload)
+            changes = changed_cell_ranges(upload.sheet_name, old_rows, new_rows)
+            data.extend(changes)
+            cells = sum(len(change['values'][0]) for change in changes)
+            if not changes:
+                print(f"Sheet '{upload.sheet_name}' is already up to date.")
+            else:
+                print(f"Updated {cells} cells of sheet '{upload.sheet_name}' ({upload.item_count} items, "
+                      f"{kept} kept their expense split).")
+
+        if data:
+            self._execute(self.service.spreadsheets().values().batchUpdate(
                 spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!A1",
-                valueInputOption='USER_ENTERED',
-                body={'values': sheet_data}
-            ).execute()
-            
-            print(f"Successfully updated sheet '{sheet_name}' with {len(data)} items, expense tracking columns, and summary calculations.")
-            
+                body={'valueInputOption': 'USER_ENTERED', 'data': data}
+            ), 'values.batchUpdate')
+
+    def append_to_ledger(self, spreadsheet_id: str, entries: List[Tuple[str, str, ParsedReceipt]]) -> List[str]:
+        """Append receipts to monthly ledger tabs with a fixed number of API calls.
+
+        ``entries`` are (receipt ID, store, receipt) tuples. Missing month tabs are
+        created in one ``spreadsheets.batchUpdate``, the receipt IDs already on the
+        existing ones are read in one ``values.batchGet`` so that re-uploads are
+        skipped, and each month gets a single ``values.append``, however large the
+        spreadsheet has grown. Receipts go to the current spreadsheet of
+        ``spreadsheet_id``, which is rolled over once the cell budget is reached.
+
+        Returns:
+            The ledger tab of each entry
+        """
+        if not self.service:
+            raise RuntimeError("Google Sheets service not initialized. Call authenticate_google_sheets() first.")
+
+        try:
+            pending = []
+            for entry in entries:
+                if self.sheet_index and self.sheet_index.spreadsheet_of(spreadsheet_id, entry[0], ledger_sheet_name(entry[2])):
+                    print(f"Receipt {entry[0]} is already in '{ledger_sheet_name(entry[2])}', not appending it again.")
+                else:
+                    pending.append(entry)
+
+            if pending:
+                new_cells = sum(len(receipt.items) + 1 for _, _, receipt in pending) * len(LEDGER_HEADER)
+                target = self.spreadsheet_with_room(spreadsheet_id, self.current_spreadsheet(spreadsheet_id), new_cells)
+                self._append_ledger_rows(target, pending)
+                if self.sheet_index:
+                    for rid, _, receipt in pending:
+                        self.sheet_index.record(rid, target, ledger_sheet_name(receipt))
+                self._report_cells(target)
+
         except Exception as e:
-            print(f"Error updating Google Sheet: {e}")
+            self.invalidate_sheet_ids()
+            print(f"Error appending to the Google Sheets ledger: {e}")
+            print("Run it again to append the rest: receipts already in the ledger are skipped.")
             sys.exit(1)
-    
-    def create_new_spreadsheet(self, title: str, data: List[Tuple[str, str]], pdf_path: str) -> str:
+        finally:
+            if self.sheet_index:
+                self.sheet_index.save()
+
+        return [ledger_sheet_name(receipt) for _, _, receipt in entries]
+
+    def _append_ledger_rows(self, spreadsheet_id: str, entries: List[Tuple[str, str, ParsedReceipt]]) -> None:
+        """Append receipts to the month tabs of one spreadsheet, skipping those already on them."""
+        months: Dict[str, List[Tuple[str, str, ParsedReceipt]]] = {}
+        for entry in entries:
+            months.setdefault(ledger_sheet_name(entry[2]), []).append(entry)
+
+        sheet_ids = self.get_sheet_ids(spreadsheet_id)
+        grids = self.get_sheet_grids(spreadsheet_id)
+        missing = [sheet_name for sheet_name in months if sheet_name not in sheet_ids]
+        existing = [sheet_name for sheet_name in months if sheet_name in sheet_ids]
+        if missing:
+            # Start from a single row: values.append inserts the rows it writes
+            self._add_sheets(spreadsheet_id, [{'addSheet': {'properties': {
+                'title': sheet_name,
+                'gridProperties': {'rowCount': 1, 'columnCount': len(LEDGER_HEADER)}
+            }}} for sheet_name in missing])
+            for sheet_name in missing:
+                print(f"Created new ledger sheet: {sheet_name}")
+
+        known_ids: Dict[str, set] = {sheet_name: set() for sheet_name in months}
+        if existing:
+            response = self._execute(self.service.spreadsheets().values().batchGet(
+                spreadsheetId=spreadsheet_id,
+                ranges=[sheet_range(sheet_name, 'C:C') for sheet_name in existing]
+            ), 'values.batchGet')
+            for sheet_name, value_range in zip(existing, response.get('valueRanges', [])):
+                known_ids[sheet_name] = {row[0] for row in value_range.get('values', []) if row}
+
+        for sheet_name, month_entries in months.items():
+            rows = [LEDGER_HEADER] if sheet_name in missing else []
+            appended = 0
+            for rid, store, receipt in month_entries:
+                if rid in known_ids[sheet_name]:
+                    print(f"Receipt {rid} is already in '{sheet_name}', not appending it again.")
+                    continue
+                known_ids[sheet_name].add(rid)
+                rows.extend(ledger_rows(rid, store, receipt))
+                appended += 1
+            if not rows:
+                continue
+            self._execute(self.service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id,
+                range=sheet_range(sheet_name, LEDGER_COLUMNS),
+                valueInputOption='USER_ENTERED',
+                insertDataOption='INSERT_ROWS',
+                body={'values': rows}
+            ), 'values.append')
+            row_count, column_count = grids.get(sheet_name, (0, len(LEDGER_HEADER)))
+            grids[sheet_name] = (row_count + len(rows), column_count)
+            print(f"Appended {appended} receipt(s) to ledger sheet '{sheet_name}'.")
+
+    def current_spreadsheet(self, spreadsheet_id: str) -> str:
+        """The spreadsheet new receipts of ``spreadsheet_id`` go to: its latest rollover, if any."""
+        return self.sheet_index.current(spreadsheet_id) if self.sheet_index else spreadsheet_id
+
+    def spreadsheet_with_room(self, spreadsheet_id: str, current: str, new_cells: int) -> str:
+        """Return ``current``, or a new spreadsheet if ``new_cells`` more would exceed the cell budget."""
+        used = self.cells_used(current)
+        # A fresh spreadsheet (a single cell) takes the receipts even if they alone exceed the budget
+        if self.cell_budget and used > 1 and used + new_cells > self.cell_budget:
+            print(f"Spreadsheet {current} uses {used:,} of its {self.cell_budget:,} cell budget, rolling over.")
+            return self.roll_over(spreadsheet_id)
+        return current
+
+    def roll_over(self, spreadsheet_id: str) -> str:
+        """Create the next spreadsheet for ``spreadsheet_id`` and record it in the spreadsheet index.
+
+        Returns:
+            The ID of the new spreadsheet
+        """
+        title = self._execute(self.service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields='properties.title'
+        ), 'get')['properties']['title']
+        title = f"{title} (from {time.strftime('%Y-%m-%d')})"
+        spreadsheet = self._execute(self.service.spreadsheets().create(body={
+            'properties': {'title': title},
+            # A spreadsheet needs one tab; keep it to a single cell
+            'sheets': [{'properties': {'title': 'Receipts', 'gridProperties': {'rowCount': 1, 'columnCount': 1}}}]
+        }), 'create')
+
+        new_id = spreadsheet['spreadsheetId']
+        self._sheet_ids[new_id], self._sheet_grids[new_id] = {}, {}
+        for sheet in spreadsheet.get('sheets', []):
+            self._record_sheet(new_id, sheet['properties'])
+        if self.sheet_index:
+            self.sheet_index.add_rollover(spreadsheet_id, new_id, title)
+            self.sheet_index.save()
+        print(f"Created spreadsheet '{title}' for new receipts: https://docs.google.com/spreadsheets/d/{new_id}/edit")
+        return new_id
+
+    def _load_sheet_metadata(self, spreadsheet_id: str, refresh: bool = False) -> None:
+        if refresh or spreadsheet_id not in self._sheet_ids:
+            spreadsheet = self._execute(self.service.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields='sheets.properties(title,sheetId,gridProperties)'
+            ), 'get')
+            # Refreshed in place: callers may hold on to these dicts
+            self._sheet_ids.setdefault(spreadsheet_id, {}).clear()
+            self._sheet_grids.setdefault(spreadsheet_id, {}).clear()
+            for sheet in spreadsheet.get('sheets', []):
+                self._record_sheet(spreadsheet_id, sheet['properties'])
+
+    def _add_sheets(self, spreadsheet_id: str, requests: List[dict]) -> None:
+        """Send a batchUpdate that adds tabs (and may resize others), and record the new tabs.
+
+        If it times out or fails with a 5xx, the server may still have added some
+        tabs, and sending the same addSheet again would fail because the title
+        exists. So the tab list is fetched again and only the tabs still missing
+        are requested, after the usual backoff.
+        """
+        for attempt in range(self.scheduler.max_retries + 1):
+            try:
+                response = self._execute(self.service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'requests': requests}
+                ), 'batchUpdate')
+                break
+            except Exception as e:
+                status = _http_status(e)
+                retryable = isinstance(e, (ConnectionError, TimeoutError)) or status in RETRYABLE_STATUSES
+                if not retryable or attempt == self.scheduler.max_retries:
+                    raise
+                delay = self.scheduler._backoff_delay(attempt, e)
+                print(f"Sheets API batchUpdate failed ({status or type(e).__name__}), "
+                      f"checking which tabs were added and retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+            self._load_sheet_metadata(spreadsheet_id, refresh=True)
+            existing = self._sheet_ids[spreadsheet_id]
+            # Resizes are safe to send again; tabs that now exist are not
+            requests = [request for request in requests
+                        if request.get('addSheet', {}).get('properties', {}).get('title') not in existing]
+            if not requests:
+                return
+
+        # Record the new tabs locally instead of fetching the metadata again
+        for reply in response.get('replies', []):
+            if 'addSheet' in reply:
+                self._record_sheet(spreadsheet_id, reply['addSheet']['properties'])
+
+    def _record_sheet(self, spreadsheet_id: str, properties: dict) -> None:
+        """Remember a tab's sheetId and grid size from its properties."""
+        grid = properties.get('gridProperties', {})
+        self._sheet_ids[spreadsheet_id][properties['title']] = properties['sheetId']
+        self._sheet_grids[spreadsheet_id][properties['title']] = (grid.get('rowCount', 0), grid.get('columnCount', 0))
+
+    def get_sheet_ids(self, spreadsheet_id: str) -> Dict[str, int]:
+        """Return the spreadsheet's tab titles mapped to their sheetIds.
+
+        Only the tab titles, IDs and grid sizes are requested, not the whole
+        spreadsheet resource, and the result is cached for the lifetime of this processor.
+        """
+        self._load_sheet_metadata(spreadsheet_id)
+        return self._sheet_ids[spreadsheet_id]
+
+    def get_sheet_grids(self, spreadsheet_id: str) -> Dict[str, Tuple[int, int]]:
+        """Return the spreadsheet's tab titles mapped to their (rows, columns) grid size."""
+        self._load_sheet_metadata(spreadsheet_id)
+        return self._sheet_grids[spreadsheet_id]
+
+    def cells_used(self, spreadsheet_id: str) -> int:
+        """Cells allocated by the spreadsheet's grids, which is what the 10 million cell limit counts."""
+        return sum(rows * columns for rows, columns in self.get_sheet_grids(spreadsheet_id).values())
+
+    def _report_cells(self, spreadsheet_id: str) -> None:
+        budget = f" of the {self.cell_budget:,} budget" if self.cell_budget else ""
+        print(f"Spreadsheet {spreadsheet_id} grids use {self.cells_used(spreadsheet_id):,} cells{budget}.")
+
+    def invalidate_sheet_ids(self, spreadsheet_id: str = None) -> None:
+        """Forget cached tab metadata for one spreadsheet, or for all of them."""
+        if spreadsheet_id is None:
+            self._sheet_ids.clear()
+            self._sheet_grids.clear()
+        else:
+            self._sheet_ids.pop(spreadsheet_id, None)
+            self._sheet_grids.pop(spreadsheet_id, None)
+
+    def create_new_spreadsheet(self, title: str, data: List[LineItem], pdf_total: str) -> str:
         """Create a new Google Spreadsheet with the extracted data."""
         if not self.service:
             raise RuntimeError("Google Sheets service not initialized. Call authenticate_google_sheets() first.")
 
-        # Extract PDF total
-        pdf_total = self.store_parser.extract_total(pdf_path)
-
-        # Prepare data for Google Sheets (add headers with expense tracking columns)
-        sheet_data = [['Item', 'Shared expenses', 'My expenses', 'Jessica expenses', '', '', '']]
-
-        # Add summary rows before the data with labels in column F and formulas in column G
-        data_start_row = 7  # Row where actual item data will start (1-based)
-        data_end_row = data_start_row + len(data) - 1
-        sheet_data.append(['', '', '', '', '', 'Sum of shared expenses', f'=SUM(B{data_start_row}:B{data_end_row})'])
-        sheet_data.append(['', '', '', '', '', 'Sum of my expenses', f'=SUM(C{data_start_row}:C{data_end_row})'])
-        sheet_data.append(['', '', '', '', '', "Sum of Jessica's expenses", f'=SUM(D{data_start_row}:D{data_end_row})'])
-        sheet_data.append(['', '', '', '', '', 'Sheet total', '=SUM(G2:G4)'])
-        sheet_data.append(['', '', '', '', '', 'PDF total', pdf_total])
-
-        # Add empty row for separation
-        sheet_data.append(['', '', '', '', '', '', ''])
-
-        # Convert data to expanded format
-        for item, price in data:
-            # Remove leading special characters that might cause issues in Google Sheets
-            # Strip quotes first (from old escaping logic), then strip problematic characters
-            clean_item = item.lstrip("'").lstrip('+*=@-')
-            sheet_data.append([clean_item, price, '', '', '', '', ''])
-        
+        sheet_data = self.build_sheet_data(data, pdf_total)
+
         try:
             # Create new spreadsheet
             spreadsheet_body = {
@@ -665,24 +2332,25 @@ class ReceiptProcessor:
                 },
                 'sheets': [{
                     'properties': {
-                        'title': 'Receipt Items'
+                        'title': 'Receipt Items',
+                        'gridProperties': receipt_tab_grid(sheet_data)
                     }
                 }]
             }
             
-            spreadsheet = self.service.spreadsheets().create(
+            spreadsheet = self._execute(self.service.spreadsheets().create(
                 body=spreadsheet_body
-            ).execute()
+            ), 'create')
             
             spreadsheet_id = spreadsheet['spreadsheetId']
             
             # Add data to the new spreadsheet
-            self.service.spreadsheets().values().update(
+            self._execute(self.service.spreadsheets().values().update(
                 spreadsheetId=spreadsheet_id,
                 range='Receipt Items!A1',
                 valueInputOption='USER_ENTERED',
                 body={'values': sheet_data}
-            ).execute()
+            ), 'values.update')
             
             print(f"Successfully created new spreadsheet: {title} with expense tracking columns and summary calculations")
             print(f"Spreadsheet ID: {spreadsheet_id}")
@@ -694,103 +2362,1186 @@ class ReceiptProcessor:
             print(f"Error creating Google Spreadsheet: {e}")
             sys.exit(1)
     
-    def save_to_csv(self, data: List[Tuple[str, str]], csv_path: str) -> None:
+    def save_to_csv(self, data: List[LineItem], csv_path: str) -> None:
         """Save the extracted data to a CSV file."""
         try:
             with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['Item', 'Price'])
-                writer.writerows(data)
+                writer.writerows([item.name, item.price] for item in data)
             print(f"Successfully saved {len(data)} items to {csv_path}")
         except Exception as e:
             print(f"Error saving to CSV: {e}")
             sys.exit(1)
     
     def process_receipt(self, pdf_path: str, spreadsheet_id: str = None,
-                       sheet_name: str = "Receipt Items", create_new: bool = False, csv_path: str = None) -> None:
-        """Process a receipt PDF end-to-end."""
+                       sheet_name: str = "Receipt Items", create_new: bool = False, csv_path: str = None,
+                       sinks: Optional[List[ReceiptSink]] = None, require_reconciled: bool = False) -> None:
+        """Process a receipt PDF end-to-end.
+
+        The receipt is added to every local sink in ``sinks``; it is uploaded to
+        Google Sheets as well when a spreadsheet ID or ``create_new`` is given.
+        With ``require_reconciled``, a receipt whose lines don't add up to its
+        total is not written anywhere.
+        """
         print(f"Processing receipt: {pdf_path}")
 
-        # Extract items from PDF
+        # Extract items, total and date from PDF in a single pass
         print("Extracting items from PDF...")
-        items_and_prices = self.store_parser.parse_items(pdf_path)
-        
+        receipt = self.parse_receipt(pdf_path)
+        items_and_prices = receipt.items
+
         if not items_and_prices:
             print("No items found in the receipt.")
             return
         
         print(f"Found {len(items_and_prices)} items:")
-        for item, price in items_and_prices:
-            print(f"  {item}: {price}")
-        
+        for item in items_and_prices:
+            print(f"  {item.name}: {item.price}")
+        print(f"Total check: {receipt.reconciliation()}")
+
+        if require_reconciled and not receipt.reconciled:
+            print("Error: The receipt doesn't reconcile, so it was not saved or uploaded (--require-reconciled).")
+            sys.exit(1)
+
+        if sinks:
+            with self.profiler.stage('sink_add'):
+                rid = receipt_id(pdf_path, self.cache)
+                for sink in sinks:
+                    sink.add(rid, self.store_name, receipt)
+
         # Save to CSV or Google Sheets
         if csv_path:
             print("Saving to CSV...")
-            self.save_to_csv(items_and_prices, csv_path)
-        else:
+            with self.profiler.stage('save_csv'):
+                self.save_to_csv(items_and_prices, csv_path)
+        elif spreadsheet_id or create_new or not sinks:
             # Authenticate with Google Sheets
             print("Authenticating with Google Sheets...")
             self.authenticate_google_sheets()
 
             # Upload to Google Sheets
             print("Uploading to Google Sheets...")
-            if create_new:
-                receipt_name = Path(pdf_path).stem
-                self.create_new_spreadsheet(f"Receipt - {receipt_name}", items_and_prices, pdf_path)
-            else:
-                if not spreadsheet_id:
-                    print("Error: Spreadsheet ID required when not creating new spreadsheet.")
-                    sys.exit(1)
+            self.upload_receipt(pdf_path, receipt, spreadsheet_id, sheet_name, create_new)
+
+    def upload_receipt(self, pdf_path: str, receipt: ParsedReceipt, spreadsheet_id: str = None,
+                       sheet_name: str = "Receipt Items", create_new: bool = False) -> str:
+        """Upload an already parsed receipt to Google Sheets.
+
+        Returns:
+            The name of the sheet (or title of the spreadsheet) that was written
+        """
+        if create_new:
+            receipt_name = Path(pdf_path).stem
+            title = f"Receipt - {receipt_name}"
+            self.create_new_spreadsheet(title, receipt.items, receipt.total)
+            return title
+
+        if not spreadsheet_id:
+            print("Error: Spreadsheet ID required when not creating new spreadsheet.")
+            sys.exit(1)
+
+        if self.sheet_layout == 'ledger':
+            return self.append_to_ledger(spreadsheet_id, [(receipt_id(pdf_path, self.cache), self.store_name, receipt)])[0]
+
+        # Use PDF date as sheet name if default name was used
+        final_sheet_name = self.resolve_sheet_name(receipt, sheet_name)
+        auto_name = final_sheet_name != sheet_name
+
+        rid = receipt_id(pdf_path, self.cache) if self.sheet_index else ""
+        final_sheet_name = self.create_or_update_sheet(spreadsheet_id, final_sheet_name, receipt.items, receipt.total,
+                                                       rid, auto_name)
+        if auto_name:
+            print(f"Using PDF date as sheet name: {final_sheet_name}")
+        return final_sheet_name
+
+    def resolve_sheet_name(self, receipt: ParsedReceipt, sheet_name: str = "Receipt Items",
+                           store_name: Optional[str] = None) -> str:
+        """Name the receipt's tab after its date and store unless a sheet name was given."""
+        if sheet_name == "Receipt Items" and receipt.date:
+            return f"{receipt.date}-{store_name or self.store_name}"
+        return sheet_name
+
+
+# --store value that picks the parser per PDF with detect_store()
+AUTO_STORE = 'auto'
+
+# Installed packages add store parsers under this entry point group, e.g. in their pyproject.toml:
+#   [project.entry-points."bills2sheet.store_parsers"]
+#   coop = "bills2sheet_coop:CoopParser"
+STORE_PARSER_ENTRY_POINTS = 'bills2sheet.store_parsers'
+
+# Characters of first-page text read when the file name and metadata don't identify the store
+DETECT_CHARS = 300
+
+# Receipt dates appear in Kivra download names, e.g. "ICA Supermarket Brommaplan 2026-05-04.pdf"
+FILENAME_DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+
+def _name_fingerprint(name: str) -> str:
+    """Fingerprint matching a store's name as a whole word, e.g. 'ICA' but not 'Africa'."""
+    return rf'(?<![a-zåäö]){re.escape(name)}(?![a-zåäö])'
+
+
+class StoreRegistration:
+    """A store parser known by its --store name.
+
+    Built-in parsers are registered with their class. Parsers from other
+    packages are registered from entry point metadata only, with a fingerprint
+    derived from the entry point name; their module is imported the first time
+    the parser is needed, after which the class's own ``fingerprint`` is used.
+    """
+
+    def __init__(self, name: str, parser_class: Optional[type] = None, entry_point=None,
+                 fingerprint: Optional[str] = None):
+        self.name = name
+        self.entry_point = entry_point
+        self._parser_class = parser_class
+        self.fingerprint = re.compile(fingerprint or _name_fingerprint(name), re.IGNORECASE)
+
+    @property
+    def loaded(self) -> bool:
+        return self._parser_class is not None
 
-                # Use PDF date as sheet name if default name was used
-                final_sheet_name = sheet_name
-                if sheet_name == "Receipt Items":
-                    pdf_date = self.store_parser.extract_date(pdf_path)
-                    if pdf_date:
-                        final_sheet_name = f"{pdf_date}-{self.store_name}"
-                        print(f"Using PDF date as sheet name: {final_sheet_name}")
+    def load(self) -> type:
+        """Return the parser class, importing the plugin module on first use."""
+        if self._parser_class is None:
+            parser_class = self.entry_point.load()
+            if not (isinstance(parser_class, type) and issubclass(parser_class, StoreParser)):
+                raise TypeError(f"Entry point '{self.entry_point.value}' for store '{self.name}' is not a StoreParser subclass")
+            self._parser_class = parser_class
+            if parser_class.fingerprint:
+                self.fingerprint = re.compile(parser_class.fingerprint, re.IGNORECASE)
+        return self._parser_class
 
-                self.create_or_update_sheet(spreadsheet_id, final_sheet_name, items_and_prices, pdf_path)
+
+# Plugin parsers import receipt_processor. When this file runs as a script (or as __mp_main__ in a
+# spawned worker), point that name at the running module so they subclass the same StoreParser.
+sys.modules.setdefault('receipt_processor', sys.modules[__name__])
+
+# --store name -> registration, in registration order; plugins are added on first lookup
+_STORE_PARSERS: Dict[str, StoreRegistration] = {}
+_plugins_discovered = False
+
+
+def register_store_parser(name: str, parser_class: type, fingerprint: Optional[str] = None) -> None:
+    """Make a StoreParser subclass available as ``--store NAME`` and to store detection.
+
+    Args:
+        name: Store name; stored upper-case and used in tab names
+        parser_class: The StoreParser subclass
+        fingerprint: Regular expression identifying the store's receipts
+            (default: the class's ``fingerprint``, or the name as a word)
+    """
+    name = name.upper()
+    _STORE_PARSERS[name] = StoreRegistration(name, parser_class, fingerprint=fingerprint or parser_class.fingerprint)
+
+
+def _discover_store_plugins() -> None:
+    """Register the parsers advertised by installed packages, without importing them."""
+    global _plugins_discovered
+    if _plugins_discovered:
+        return
+    _plugins_discovered = True
+
+    from importlib.metadata import entry_points
+
+    for entry_point in entry_points(group=STORE_PARSER_ENTRY_POINTS):
+        name = entry_point.name.upper()
+        # Built-in and explicitly registered parsers take precedence
+        if name not in _STORE_PARSERS:
+            _STORE_PARSERS[name] = StoreRegistration(name, entry_point=entry_point)
+
+
+def store_names(include_plugins: bool = True) -> List[str]:
+    """Names accepted by --store, built-in parsers first."""
+    if include_plugins:
+        _discover_store_plugins()
+    return list(_STORE_PARSERS)
+
+
+def get_store_registration(store: str) -> Optional[StoreRegistration]:
+    """Look up a store by name. Installed plugins are only looked for if it isn't built in."""
+    name = store.upper()
+    if name not in _STORE_PARSERS:
+        _discover_store_plugins()
+    return _STORE_PARSERS.get(name)
+
+
+register_store_parser('ICA', ICAParser)
+register_store_parser('WILLYS', WillysParser)
+
+
+def create_store_parser(store: str) -> StoreParser:
+    """Create the parser for a --store choice."""
+    registration = get_store_registration(store)
+    if registration is None:
+        print(f"Error: Unknown store type '{store}'. Known stores: {', '.join(store_names())}")
+        sys.exit(1)
+    return registration.load()()
+
+
+def _match_store(text: str) -> Optional[str]:
+    """Return the store whose fingerprint occurs first in the text, if any."""
+    matches = []
+    for store, registration in _STORE_PARSERS.items():
+        match = registration.fingerprint.search(text)
+        if match:
+            matches.append((match.start(), store))
+    return min(matches)[1] if matches else None
+
+
+def _load_store_plugins() -> bool:
+    """Import every plugin parser not loaded yet, for their own fingerprints. Returns True if any were loaded."""
+    loaded = False
+    for registration in _STORE_PARSERS.values():
+        if registration.loaded:
+            continue
+        try:
+            registration.load()
+            loaded = True
+        except Exception as e:
+            print(f"Warning: could not load the parser for store '{registration.name}': {e}")
+    return loaded
+
+
+class _EnoughText(Exception):
+    pass
+
+
+def _leading_page_text(page, max_chars: int = DETECT_CHARS) -> str:
+    """Decode the first characters drawn on a page, stopping as soon as there are enough.
+
+    Runs the page's content stream through a device that only decodes strings,
+    skipping pdfplumber's object model and layout analysis altogether.
+    """
+    from pdfminer.pdfdevice import PDFDevice
+    from pdfminer.pdffont import PDFUnicodeNotDefined
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+    parts = []
+
+    class LeadingTextDevice(PDFDevice):
+        def render_string(self, textstate, seq, ncs, graphicstate):
+            font = textstate.font
+            for obj in seq:
+                if not isinstance(obj, bytes):
+                    continue
+                for cid in font.decode(obj):
+                    try:
+                        parts.append(font.to_unichr(cid))
+                    except PDFUnicodeNotDefined:
+                        pass
+            # Separate text-showing operators, which usually draw one word or line each
+            parts.append(' ')
+            if len(parts) >= max_chars:
+                raise _EnoughText()
+
+    resources = PDFResourceManager()
+    try:
+        PDFPageInterpreter(resources, LeadingTextDevice(resources)).process_page(page)
+    except _EnoughText:
+        pass
+    return ''.join(parts)
+
+
+def detect_store(pdf_path: str) -> Optional[str]:
+    """Work out which store a receipt PDF comes from, without laying it out.
+
+    Checks, from cheapest to most expensive, the file name, the PDF metadata
+    (title, author, creator, ...) and the first characters of the first page
+    against every registered store's fingerprint. Plugin parsers are only
+    imported, for their own fingerprints, if none of that matched.
+
+    Returns:
+        A registered store name, or None if the store couldn't be recognized
+    """
+    _discover_store_plugins()
+    texts = [Path(pdf_path).name]
+    store = _match_store(texts[0])
+    if store:
+        return store
+
+    # pdfminer comes with pdfplumber; only its parser and interpreter are used here
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+    from pdfminer.utils import decode_text
+
+    with open(pdf_path, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+
+        metadata = []
+        for info in document.info:
+            for value in info.values():
+                value = resolve1(value)
+                if isinstance(value, bytes):
+                    metadata.append(decode_text(value))
+        texts.append(' '.join(metadata))
+        store = _match_store(texts[-1])
+        if store:
+            return store
+
+        page = next(PDFPage.create_pages(document), None)
+        if page is not None:
+            texts.append(_leading_page_text(page))
+            store = _match_store(texts[-1])
+            if store:
+                return store
+
+    if _load_store_plugins():
+        for text in texts:
+            store = _match_store(text)
+            if store:
+                return store
+    return None
+
+
+def resolve_stores(store: str, pdf_paths: List[str]) -> Dict[str, Optional[str]]:
+    """Map each PDF to its store: the --store choice, or the detected store for 'auto'."""
+    if store != AUTO_STORE:
+        return {pdf_path: store for pdf_path in pdf_paths}
+
+    stores = {}
+    for pdf_path in pdf_paths:
+        try:
+            stores[pdf_path] = detect_store(pdf_path)
+        except Exception as e:
+            print(f"Warning: could not read {pdf_path} to detect its store: {e}")
+            stores[pdf_path] = None
+    return stores
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one PDF in a batch run."""
+    pdf_path: str
+    status: str  # 'ok', 'skipped' or 'failed'
+    detail: str = ""
+    receipt: Optional[ParsedReceipt] = None
+    profile: Optional[dict] = None
+    store: str = ""
+
+
+def add_sheets_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the Sheets API quota and retry options."""
+    parser.add_argument('--read-quota', type=float, default=DEFAULT_READ_QUOTA,
+                        help=f'Sheets read requests per minute (default: {DEFAULT_READ_QUOTA})')
+    parser.add_argument('--write-quota', type=float, default=DEFAULT_WRITE_QUOTA,
+                        help=f'Sheets write requests per minute (default: {DEFAULT_WRITE_QUOTA})')
+    parser.add_argument('--max-retries', type=int, default=6, help='Retries for rate-limited or failed Sheets requests (default: 6)')
+    parser.add_argument('--sheets-endpoint', metavar='URL',
+                        help='Send Sheets API requests to this server without authenticating, e.g. a local fake_sheets.py')
+    parser.add_argument('--cell-budget', type=int, default=0, metavar='CELLS',
+                        help='Continue in a new spreadsheet once the grids of the current one would exceed this many cells '
+                             '(Sheets allows 10000000; default: never)')
+    parser.add_argument('--sheet-index', default=str(DEFAULT_SHEET_INDEX_PATH), metavar='PATH',
+                        help=f'Local index of rolled-over spreadsheets and of the spreadsheet holding each receipt '
+                             f'(default: {DEFAULT_SHEET_INDEX_PATH})')
+
+
+def scheduler_from_args(args: argparse.Namespace) -> SheetsRequestScheduler:
+    return SheetsRequestScheduler(args.read_quota, args.write_quota, max_retries=args.max_retries)
+
+
+def add_sheet_layout_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options choosing how receipts are laid out in an existing spreadsheet."""
+    parser.add_argument('--sheet-layout', choices=['tabs', 'ledger'], default='tabs',
+                        help="'tabs' gives each receipt its own tab, 'ledger' appends receipts to one tab per month "
+                             "(default: tabs)")
+    parser.add_argument('--sheet-update', choices=['replace', 'diff'], default='replace',
+                        help="How an existing receipt tab is written: 'replace' clears and rewrites it, 'diff' writes only "
+                             "the changed cells and keeps the expense splits entered by hand (default: replace)")
+    parser.add_argument('--sheet-sums', choices=['formulas', 'values'], default='formulas',
+                        help="Summary of a receipt tab: 'formulas' sums the item rows, 'values' writes the shared sum "
+                             "precomputed, with a checksum of the items (default: formulas)")
+
+
+def add_profile_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help='Record wall and CPU time of every processing stage and write a JSON report to PATH (default: stdout)')
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the extraction cache options shared by the single-file and batch commands."""
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the extraction cache')
+    parser.add_argument('--refresh-cache', action='store_true', help='Re-parse PDFs even if cached, and update the cache')
+    parser.add_argument('--cache-path', default=str(DEFAULT_CACHE_PATH), help=f'Extraction cache database (default: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_MB,
+                        help=f'Evict least recently used cache entries beyond this size (default: {DEFAULT_CACHE_MAX_MB})')
+
+
+def add_sink_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the local sink options, usable with or without Google Sheets."""
+    parser.add_argument('--to-parquet', metavar='DIR',
+                        help='Append line items to a Parquet dataset partitioned by year, month and store (needs pyarrow)')
+    parser.add_argument('--to-arrow', metavar='FILE', help='Write line items to an Arrow IPC file (needs pyarrow)')
+    parser.add_argument('--to-sqlite', metavar='DB', help='Add receipts and line items to a local SQLite ledger')
+    # The consolidated CSV is a batch option; single receipts keep their own --to-csv format
+    parser.set_defaults(csv_sink=None)
+
+
+def has_sinks(args: argparse.Namespace) -> bool:
+    return bool(args.to_parquet or args.to_arrow or args.to_sqlite or args.csv_sink)
+
+
+def open_sinks(args: argparse.Namespace) -> List[ReceiptSink]:
+    """Create the local sinks selected on the command line."""
+    sinks = []
+    if args.csv_sink:
+        sinks.append(CsvSink(args.csv_sink))
+    if args.to_parquet:
+        sinks.append(ArrowSink(args.to_parquet, 'parquet'))
+    if args.to_arrow:
+        sinks.append(ArrowSink(args.to_arrow, 'arrow'))
+    if args.to_sqlite:
+        sinks.append(LedgerSink(args.to_sqlite))
+    return sinks
+
+
+def open_cache(args: argparse.Namespace) -> Optional[ExtractionCache]:
+    """Open the extraction cache selected by the command line, or None with --no-cache."""
+    if args.no_cache:
+        return None
+    try:
+        return ExtractionCache(args.cache_path, args.cache_max_mb * 1024 * 1024)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: extraction cache unavailable, parsing without it: {e}")
+        return None
+
+
+def _store_argument(value: str) -> str:
+    """argparse type for --store: a registered store name (any case) or 'auto'."""
+    if value.lower() == AUTO_STORE:
+        return AUTO_STORE
+    if get_store_registration(value) is None:
+        raise argparse.ArgumentTypeError(f"unknown store '{value}' (choose from {', '.join(store_names() + [AUTO_STORE])})")
+    return value.upper()
+
+
+def _iso_date(value: str) -> str:
+    """argparse type for YYYY-MM-DD bounds, compared as strings against receipt dates."""
+    if not re.match(r'^\d{4}-\d{2}-\d{2}$', value):
+        raise argparse.ArgumentTypeError(f"expected a date in YYYY-MM-DD format, got '{value}'")
+    return value
+
+
+def _in_date_range(date: str, date_from: str = None, date_to: str = None) -> bool:
+    """Check an ISO date against optional inclusive bounds."""
+    if date_from and date < date_from:
+        return False
+    if date_to and date > date_to:
+        return False
+    return True
+
+
+def find_receipt_files(source: str, store: str = None, date_from: str = None, date_to: str = None) -> List[str]:
+    """Find receipt PDFs in a directory or matching a glob pattern.
+
+    Files whose name mentions another store are skipped. Files whose name carries a
+    YYYY-MM-DD date outside the range are skipped here, without opening them;
+    files without a date in the name are kept and checked after parsing.
+    """
+    source_path = Path(source)
+    if source_path.is_dir():
+        candidates = [str(p) for p in source_path.iterdir() if p.suffix.lower() == '.pdf']
+    else:
+        candidates = glob.glob(source)
+
+    # Store names are matched as whole words, so e.g. "replica" doesn't count as ICA
+    other_stores = [get_store_registration(s).fingerprint for s in store_names() if s != store]
+    pdf_paths = []
+    for pdf_path in sorted(candidates):
+        name = Path(pdf_path).name
+        if store and any(other.search(name) for other in other_stores):
+            continue
+
+        date_match = FILENAME_DATE_PATTERN.search(Path(pdf_path).name)
+        if date_match and not _in_date_range(date_match.group(1), date_from, date_to):
+            continue
+
+        pdf_paths.append(pdf_path)
+
+    return pdf_paths
+
+
+def _parse_receipt_file(store: str, pdf_path: str, profile: bool = False) -> Tuple[ParsedReceipt, Optional[dict]]:
+    """Parse one PDF. Module-level so it can run in a worker process.
+
+    Returns:
+        The parsed receipt, and its StageProfiler report when profiling
+    """
+    profiler = StageProfiler() if profile else None
+    with ReceiptDocument(pdf_path, profiler) as document:
+        receipt = create_store_parser(store).parse(document)
+    return receipt, profiler.report() if profiler else None
+
+
+def parse_receipt_files(store: str, pdf_paths: List[str], workers: int = 1,
+                        cache: Optional[ExtractionCache] = None, refresh_cache: bool = False,
+                        profiler: Optional[StageProfiler] = None) -> List[BatchResult]:
+    """Parse PDFs, in a process pool when more than one worker is requested.
+
+    With ``store`` 'auto', each PDF's store is detected first and PDFs that
+    can't be recognized fail. Cache lookups and stores happen in this process;
+    workers only parse misses. With a ``profiler``, cache access is recorded on
+    it and each parsed receipt carries its own profile report.
+    """
+    profile = profiler is not None
+    profiler = profiler or NullProfiler()
+    results = {}
+
+    with profiler.stage('detect_store'):
+        stores = resolve_stores(store, pdf_paths)
+    to_parse = []
+    for pdf_path in pdf_paths:
+        if stores[pdf_path]:
+            to_parse.append(pdf_path)
+        else:
+            results[pdf_path] = BatchResult(pdf_path, 'failed', "could not detect the store, use --store")
+
+    if cache:
+        parser_keys = {s: create_store_parser(s).cache_key for s in set(stores.values()) if s}
+        if not refresh_cache:
+            misses = []
+            for pdf_path in to_parse:
+                with profiler.stage('cache_lookup'):
+                    cached = cache.get(pdf_path, parser_keys[stores[pdf_path]])
+                if cached is not None:
+                    results[pdf_path] = BatchResult(pdf_path, 'ok', 'cached', receipt=cached)
+                else:
+                    misses.append(pdf_path)
+            to_parse = misses
+
+    if workers <= 1 or len(to_parse) <= 1:
+        for pdf_path in to_parse:
+            try:
+                receipt, report = _parse_receipt_file(stores[pdf_path], pdf_path, profile)
+                results[pdf_path] = BatchResult(pdf_path, 'ok', receipt=receipt, profile=report)
+            except SystemExit:
+                results[pdf_path] = BatchResult(pdf_path, 'failed', "parse error, see message above")
+            except Exception as e:
+                results[pdf_path] = BatchResult(pdf_path, 'failed', f"parse error: {e}")
+    else:
+        # Imported here: concurrent.futures.process pulls in multiprocessing, which single-file runs never need
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_parse_receipt_file, stores[pdf_path], pdf_path, profile): pdf_path
+                       for pdf_path in to_parse}
+            for future in as_completed(futures):
+                pdf_path = futures[future]
+                try:
+                    receipt, report = future.result()
+                    results[pdf_path] = BatchResult(pdf_path, 'ok', receipt=receipt, profile=report)
+                except SystemExit:
+                    # Parsers exit on unreadable PDFs; in a batch that only fails this file
+                    results[pdf_path] = BatchResult(pdf_path, 'failed', "parse error, see message above")
+                except Exception as e:
+                    results[pdf_path] = BatchResult(pdf_path, 'failed', f"parse error: {e}")
+
+    if cache:
+        for pdf_path in to_parse:
+            if results[pdf_path].status == 'ok':
+                with profiler.stage('cache_store'):
+                    cache.put(pdf_path, parser_keys[stores[pdf_path]], results[pdf_path].receipt)
+
+    for pdf_path in pdf_paths:
+        results[pdf_path].store = stores[pdf_path] or ""
+    return [results[pdf_path] for pdf_path in pdf_paths]
+
+
+def plan_sheet_uploads(processor: 'ReceiptProcessor', results: List[BatchResult]) -> List[SheetUpload]:
+    """Turn parsed receipts into one SheetUpload per receipt tab.
+
+    Tabs are named after the receipt's date and store. Two receipts from the
+    same store on the same day would share that name, so upload_sheets() keeps
+    each receipt on the tab it was first written to and gives a new receipt a
+    numeric suffix instead of overwriting another receipt's tab.
+    """
+    uploads = []
+    for result in results:
+        sheet_name = processor.resolve_sheet_name(result.receipt, store_name=result.store or None)
+        values = processor.build_sheet_data(result.receipt.items, result.receipt.total)
+        rid = receipt_id(result.pdf_path, processor.cache) if processor.sheet_index else ""
+        uploads.append(SheetUpload(sheet_name, values, len(result.receipt.items), receipt_id=rid, auto_name=True))
+    return uploads
+
+
+def _describe_upload(result: BatchResult, destination: str) -> str:
+    """Per-file summary line for an uploaded receipt."""
+    cached = " (cached)" if result.detail == 'cached' else ""
+    return f"{len(result.receipt.items)} items{cached} -> {destination}"
+
+
+def batch_main(argv: List[str]) -> None:
+    """Entry point for `receipt_processor.py batch`."""
+    parser = argparse.ArgumentParser(
+        prog='receipt_processor.py batch',
+        description='Process every receipt PDF in a directory or glob in one run, parsing in parallel and authenticating once')
+    parser.add_argument('source', help='Directory of receipt PDFs, or a quoted glob such as "bills/ICA*2026-05-*.pdf"')
+    parser.add_argument('--store', required=True, type=_store_argument,
+                        help="Store type (ICA, WILLYS or one added by an installed plugin), or 'auto' to detect it for each PDF")
+    parser.add_argument('--from', dest='date_from', type=_iso_date, help='Only process receipts dated on or after YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', type=_iso_date, help='Only process receipts dated on or before YYYY-MM-DD')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of parser processes (default: CPU count)')
+    parser.add_argument('--spreadsheet-id', help='Google Sheets spreadsheet ID (required unless --create-new)')
+    parser.add_argument('--create-new', action='store_true', help='Create a new spreadsheet for each receipt')
+    parser.add_argument('--credentials', default='credentials.json', help='Path to Google API credentials file')
+    parser.add_argument('--token', default='token.json', help='Path to token file for storing authentication')
+    parser.add_argument('--to-csv', dest='csv_sink', metavar='FILE',
+                        help='Append every line of the batch, with receipt ID, date and store columns, to one CSV file; '
+                             'receipts already in it are skipped')
+    parser.add_argument('--require-reconciled', action='store_true',
+                        help="Fail receipts whose lines don't add up to the printed total instead of saving or uploading them")
+    add_sink_arguments(parser)
+    add_cache_arguments(parser)
+    add_sheets_arguments(parser)
+    add_sheet_layout_arguments(parser)
+    add_profile_argument(parser)
+
+    args = parser.parse_args(argv)
+
+    upload = args.create_new or args.spreadsheet_id
+    if not upload and not has_sinks(args):
+        print("Error: Either --spreadsheet-id, --create-new, --to-csv, --to-parquet, --to-arrow or --to-sqlite must be provided.")
+        sys.exit(1)
+
+    pdf_paths = find_receipt_files(args.source, None if args.store == AUTO_STORE else args.store,
+                                   args.date_from, args.date_to)
+    if not pdf_paths:
+        print(f"No receipt PDFs matched {args.source}")
+        return
+
+    workers = max(1, min(args.workers, len(pdf_paths)))
+    print(f"Parsing {len(pdf_paths)} receipts with {workers} worker(s)...")
+    cache = open_cache(args)
+    profiler = StageProfiler() if args.profile else None
+    scheduler = scheduler_from_args(args)
+    results = parse_receipt_files(args.store, pdf_paths, workers, cache, args.refresh_cache, profiler)
+
+    for result in results:
+        if result.status != 'ok':
+            continue
+        if not result.receipt.items:
+            result.status, result.detail = 'skipped', 'no items found'
+        elif (not FILENAME_DATE_PATTERN.search(Path(result.pdf_path).name) and result.receipt.date
+              and not _in_date_range(result.receipt.date, args.date_from, args.date_to)):
+            result.status, result.detail = 'skipped', f"dated {result.receipt.date}, outside range"
+        elif args.require_reconciled and not result.receipt.reconciled:
+            # Checked for every receipt before anything is written, so no quota goes on receipts that need fixing
+            result.status, result.detail = 'failed', result.receipt.reconciliation()
+
+    parsed = [result for result in results if result.status == 'ok']
+    sinks = open_sinks(args)
+    if sinks and parsed:
+        # The sinks are written from this process only, whatever the number of parser workers
+        with (profiler or NullProfiler()).stage('sink_add'):
+            for result in parsed:
+                rid = receipt_id(result.pdf_path, cache)
+                for sink in sinks:
+                    sink.add(rid, result.store, result.receipt)
+    for sink in sinks:
+        sink.close()
+    if not upload:
+        for result in parsed:
+            result.detail = _describe_upload(result, ', '.join(sink.path for sink in sinks))
+
+    to_upload = parsed if upload else []
+    if to_upload:
+        # Uploading doesn't depend on the parser; tab names use each result's own store
+        store = to_upload[0].store
+        processor = ReceiptProcessor(create_store_parser(store), store, args.credentials, args.token,
+                                     profiler=profiler, scheduler=scheduler, sheets_endpoint=args.sheets_endpoint,
+                                     diff_updates=args.sheet_update == 'diff', sheet_layout=args.sheet_layout,
+                                     precomputed_sums=args.sheet_sums == 'values',
+                                     sheet_index=SpreadsheetIndex(args.sheet_index), cell_budget=args.cell_budget)
+        print("Authenticating with Google Sheets...")
+        processor.authenticate_google_sheets()
+
+        print(f"Uploading {len(to_upload)} receipts to Google Sheets...")
+        if args.create_new:
+            for result in to_upload:
+                try:
+                    title = processor.upload_receipt(result.pdf_path, result.receipt, create_new=True)
+                    result.detail = _describe_upload(result, title)
+                except SystemExit:
+                    result.status, result.detail = 'failed', "upload error, see message above"
+                except Exception as e:
+                    result.status, result.detail = 'failed', f"upload error: {e}"
+        elif args.sheet_layout == 'ledger':
+            try:
+                entries = [(receipt_id(result.pdf_path, cache), result.store, result.receipt) for result in to_upload]
+                for result, sheet_name in zip(to_upload, processor.append_to_ledger(args.spreadsheet_id, entries)):
+                    result.detail = _describe_upload(result, sheet_name)
+            except (Exception, SystemExit) as e:
+                detail = "upload error, see message above" if isinstance(e, SystemExit) else f"upload error: {e}"
+                for result in to_upload:
+                    result.status, result.detail = 'failed', detail
+        else:
+            uploads = plan_sheet_uploads(processor, to_upload)
+            try:
+                processor.upload_sheets(args.spreadsheet_id, uploads)
+                for result, upload in zip(to_upload, uploads):
+                    result.detail = _describe_upload(result, upload.sheet_name)
+            except (Exception, SystemExit) as e:
+                detail = "upload error, see message above" if isinstance(e, SystemExit) else f"upload error: {e}"
+                for result in to_upload:
+                    result.status, result.detail = 'failed', detail
+
+    print("\nBatch results:")
+    for result in results:
+        if result.status == 'ok' and not result.receipt.reconciled:
+            result.detail += f"; {result.receipt.reconciliation()}"
+        print(f"  [{result.status}] {result.pdf_path}: {result.detail}")
+    if to_upload:
+        print(scheduler.summary())
+
+    if profiler:
+        receipt_reports = [dict(pdf_path=result.pdf_path, **result.profile) for result in results if result.profile]
+        session_report = profiler.report()
+        write_profile({
+            'receipts': receipt_reports,
+            'session': session_report,
+            'aggregate': aggregate_reports(receipt_reports + [session_report]),
+            'sheets_quota': scheduler.report(),
+        }, args.profile)
+
+    failed = sum(1 for result in results if result.status == 'failed')
+    print(f"{len(results) - failed} of {len(results)} receipts processed without errors.")
+    if failed:
+        sys.exit(1)
+
+
+DEFAULT_SOCKET_PATH = DEFAULT_CACHE_PATH.parent / 'receipt-server.sock'
+
+
+def _warm_parser_worker() -> None:
+    """Process pool initializer: import pdfplumber before the first job arrives."""
+    import signal
+    import pdfplumber  # noqa: F401
+
+    # Ctrl-C reaches the whole process group; only the server decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ReceiptServer:
+    """Long-running receipt processor that accepts jobs over a local Unix socket.
+
+    The interpreter, pdfplumber, the extraction cache and the authorized Sheets
+    service stay loaded between jobs. Jobs wait in a bounded queue and are
+    parsed concurrently in a process pool; uploads share one Sheets service and
+    are serialized, since the underlying HTTP connection isn't thread-safe.
+    On SIGINT/SIGTERM the server stops accepting jobs and finishes the queued
+    and in-flight ones before exiting.
+
+    Protocol: the client sends one JSON object per connection, terminated by a
+    newline, and receives one JSON reply with ``status`` and ``detail``.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, workers: int = os.cpu_count() or 1,
+                 queue_size: int = 64, credentials_file: str = 'credentials.json', token_file: str = 'token.json',
+                 cache: Optional[ExtractionCache] = None, scheduler: Optional[SheetsRequestScheduler] = None,
+                 sheets_endpoint: Optional[str] = None, sheet_index: Optional[SpreadsheetIndex] = None,
+                 cell_budget: int = 0, settings: Optional[dict] = None):
+        import queue
+
+        self.socket_path = Path(socket_path)
+        self.workers = max(1, workers)
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.sheets_endpoint = sheets_endpoint
+        self.cache = cache
+        self.sheet_index = sheet_index
+        self.cell_budget = cell_budget
+        # The options this server was started with (see daemon_settings); jobs must agree with them
+        self.settings = settings or {}
+        # One scheduler for all jobs, so they share the quota
+        self.scheduler = scheduler or SheetsRequestScheduler()
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._upload_lock = threading.Lock()
+        self._processors: Dict[str, ReceiptProcessor] = {}
+        self._service = None
+        # Every job uses the same token, refreshed in memory before it expires
+        self._credentials = CredentialProvider(token_file, credentials_file)
+        self._sheet_ids: Dict[str, Dict[str, int]] = {}
+        self._sheet_grids: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._pool = None
+
+    def processor_for(self, store: str) -> 'ReceiptProcessor':
+        """Return the processor for a store; all of them share one Sheets service and tab metadata."""
+        if store not in self._processors:
+            processor = ReceiptProcessor(create_store_parser(store), store, self.credentials_file, self.token_file,
+                                         cache=self.cache, scheduler=self.scheduler, sheets_endpoint=self.sheets_endpoint,
+                                         sheet_index=self.sheet_index, cell_budget=self.cell_budget,
+                                         credential_provider=self._credentials)
+            processor._sheet_ids = self._sheet_ids
+            processor._sheet_grids = self._sheet_grids
+            self._processors[store] = processor
+        processor = self._processors[store]
+        processor.service = self._service
+        return processor
+
+    def _authenticate(self, processor: 'ReceiptProcessor') -> None:
+        if self._service is None:
+            processor.authenticate_google_sheets()
+            self._service = processor.service
+
+    def serve_forever(self) -> None:
+        """Accept jobs until SIGINT/SIGTERM, then drain the queue and exit."""
+        import signal
+        import socket
+        from concurrent.futures import ProcessPoolExecutor
+
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_parser_worker)
+        # Start the workers now rather than on the first job
+        for future in [self._pool.submit(int) for _ in range(self.workers)]:
+            future.result()
+
+        # Authenticate up front when a token exists, so the first upload doesn't pay for it
+        if self.sheets_endpoint or Path(self.token_file).exists():
+            print("Authenticating with Google Sheets...")
+            self._authenticate(self.processor_for(store_names(include_plugins=False)[0]))
+
+        job_threads = [threading.Thread(target=self._job_loop, name=f"receipt-job-{i}") for i in range(self.workers)]
+        for thread in job_threads:
+            thread.start()
+
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        listener.listen()
+        listener.settimeout(0.5)
+
+        def request_stop(signum, frame):
+            print("Shutting down: finishing queued and in-flight jobs...")
+            self._stopping.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        print(f"Receipt server listening on {self.socket_path} with {self.workers} worker(s)")
+
+        try:
+            while not self._stopping.is_set():
+                try:
+                    connection, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    # accept() interrupted by a signal
+                    continue
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+        finally:
+            listener.close()
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+
+            # One sentinel per job thread; they are queued behind the remaining jobs
+            for _ in job_threads:
+                self.jobs.put(None)
+            for thread in job_threads:
+                thread.join()
+            self._pool.shutdown(wait=True)
+            print(self.scheduler.summary())
+            print("Receipt server stopped.")
+
+    def settings_mismatch(self, settings: dict) -> Optional[str]:
+        """Describe the first setting a job needs that this server doesn't use, or return None."""
+        for key, value in settings.items():
+            if self.settings.get(key) != value:
+                return f"--{key.replace('_', '-')} is {self.settings.get(key)} here, {value} for the job"
+        return None
+
+    def _handle_connection(self, connection) -> None:
+        import queue
+
+        with connection:
+            reader = connection.makefile('r', encoding='utf-8')
+            try:
+                request = json.loads(reader.readline())
+            except ValueError as e:
+                self._reply(connection, {'status': 'failed', 'detail': f"invalid request: {e}"})
+                return
+
+            if self._stopping.is_set():
+                self._reply(connection, {'status': 'busy', 'detail': 'server is shutting down'})
+                return
+
+            mismatch = self.settings_mismatch(request.get('settings', {}))
+            if mismatch:
+                self._reply(connection, {'status': 'mismatch', 'detail': mismatch})
+                return
+
+            job = {'request': request, 'done': threading.Event(), 'reply': None}
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                self._reply(connection, {'status': 'busy', 'detail': 'job queue is full'})
+                return
+
+            job['done'].wait()
+            self._reply(connection, job['reply'])
+
+    @staticmethod
+    def _reply(connection, reply: dict) -> None:
+        try:
+            connection.sendall((json.dumps(reply) + '\n').encode('utf-8'))
+        except OSError:
+            # The client went away; the job itself has still been processed
+            pass
+
+    def _job_loop(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                job['reply'] = self.run_job(job['request'])
+            except SystemExit:
+                job['reply'] = {'status': 'failed', 'detail': 'see receipt server output'}
+            except Exception as e:
+                job['reply'] = {'status': 'failed', 'detail': str(e)}
+            finally:
+                job['done'].set()
+
+    def run_job(self, request: dict) -> dict:
+        """Process one job: parse (cached or in the pool), then write CSV or upload."""
+        store = request['store']
+        pdf_path = request['pdf_path']
+        if store == AUTO_STORE:
+            store = detect_store(pdf_path)
+            if store is None:
+                return {'status': 'failed', 'detail': 'could not detect the store, use --store'}
+        processor = self.processor_for(store)
+        print(f"Processing receipt: {pdf_path}")
+
+        use_cache = self.cache is not None and not request.get('no_cache')
+        receipt = None
+        if use_cache and not request.get('refresh_cache'):
+            receipt = self.cache.get(pdf_path, processor.store_parser.cache_key)
+        if receipt is None:
+            receipt, _ = self._pool.submit(_parse_receipt_file, store, pdf_path).result()
+            if use_cache:
+                self.cache.put(pdf_path, processor.store_parser.cache_key, receipt)
+
+        if not receipt.items:
+            return {'status': 'ok', 'detail': 'no items found in the receipt'}
+        if request.get('require_reconciled') and not receipt.reconciled:
+            return {'status': 'failed', 'detail': receipt.reconciliation()}
+
+        if request.get('csv_path'):
+            processor.save_to_csv(receipt.items, request['csv_path'])
+            destination = request['csv_path']
+        else:
+            with self._upload_lock:
+                self._authenticate(processor)
+                processor = self.processor_for(store)
+                processor.diff_updates = request.get('sheet_update') == 'diff'
+                processor.sheet_layout = request.get('sheet_layout', 'tabs')
+                processor.precomputed_sums = request.get('sheet_sums') == 'values'
+                destination = processor.upload_receipt(pdf_path, receipt, request.get('spreadsheet_id'),
+                                                       request.get('sheet_name', 'Receipt Items'),
+                                                       request.get('create_new', False))
+
+        return {'status': 'ok', 'detail': f"{len(receipt.items)} items -> {destination}"}
+
+
+def forward_to_daemon(request: dict, socket_path: str = DEFAULT_SOCKET_PATH) -> Optional[dict]:
+    """Send a job to a running receipt server.
+
+    Returns:
+        The server's reply, or None if no server is running, it is too busy or
+        it runs with other settings, in which case the caller processes the
+        receipt itself
+    """
+    socket_path = Path(socket_path)
+    if not socket_path.exists():
+        return None
+
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(socket_path))
+            client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+            reply = json.loads(client.makefile('r', encoding='utf-8').readline())
+    except (OSError, ValueError):
+        # Stale socket file or a server that died mid-job
+        return None
+
+    if reply.get('status') == 'busy':
+        print(f"Receipt server busy ({reply.get('detail')}), processing locally.")
+        return None
+    if reply.get('status') == 'mismatch':
+        print(f"Receipt server runs with other settings ({reply.get('detail')}), processing locally.")
+        return None
+    return reply
+
+
+def daemon_settings(args: argparse.Namespace) -> dict:
+    """Options that decide where and how a job's receipt is stored and uploaded.
+
+    A job is only run by a receipt server started with the same values, so a
+    forwarded receipt never goes out with another token, index, cache, quota or
+    Sheets endpoint. The cache options are left out when the job doesn't use the
+    cache.
+    """
+    settings = {
+        'sheets_endpoint': args.sheets_endpoint.rstrip('/') if args.sheets_endpoint else None,
+        'credentials': str(Path(args.credentials).resolve()),
+        'token': str(Path(args.token).resolve()),
+        'sheet_index': str(Path(args.sheet_index).resolve()),
+        'cell_budget': args.cell_budget,
+        'read_quota': args.read_quota,
+        'write_quota': args.write_quota,
+        'max_retries': args.max_retries,
+    }
+    if not args.no_cache:
+        settings['cache_path'] = str(Path(args.cache_path).resolve())
+        settings['cache_max_mb'] = args.cache_max_mb
+    return settings
+
+
+def serve_main(argv: List[str]) -> None:
+    """Entry point for `receipt_processor.py serve`."""
+    parser = argparse.ArgumentParser(
+        prog='receipt_processor.py serve',
+        description='Keep a warm receipt processor running; the receipt_processor.py CLI forwards jobs to it automatically')
+    parser.add_argument('--socket', default=str(DEFAULT_SOCKET_PATH), help=f'Unix socket to listen on (default: {DEFAULT_SOCKET_PATH})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of parser processes (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=64, help='Maximum number of waiting jobs (default: 64)')
+    parser.add_argument('--credentials', default='credentials.json', help='Path to Google API credentials file')
+    parser.add_argument('--token', default='token.json', help='Path to token file for storing authentication')
+    add_cache_arguments(parser)
+    add_sheets_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        print("Error: the receipt server needs Unix domain sockets, which this platform doesn't support.")
+        sys.exit(1)
+
+    server = ReceiptServer(args.socket, args.workers, args.queue_size, args.credentials, args.token, open_cache(args),
+                           scheduler_from_args(args), args.sheets_endpoint, SpreadsheetIndex(args.sheet_index),
+                           args.cell_budget, daemon_settings(args))
+    server.serve_forever()
 
 
 def main():
-    parser = argparse.ArgumentParser(description='Process receipt PDFs with table extraction and upload to Google Sheets')
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description='Process receipt PDFs with table extraction and upload to Google Sheets',
+                                     epilog='Run "%(prog)s batch --help" to process a whole folder of receipts in one run, '
+                                            'or "%(prog)s serve --help" to keep a warm server that this command forwards to.')
     parser.add_argument('pdf_path', help='Path to the receipt PDF file')
-    parser.add_argument('--store', required=True, choices=['ICA', 'WILLYS'], help='Store type (ICA or WILLYS)')
+    parser.add_argument('--store', required=True, type=_store_argument,
+                        help="Store type (ICA, WILLYS or one added by an installed plugin), or 'auto' to detect it from the PDF")
     parser.add_argument('--spreadsheet-id', help='Google Sheets spreadsheet ID (required unless --create-new)')
     parser.add_argument('--sheet-name', default='Receipt Items', help='Name of the sheet to update (default: Receipt Items)')
     parser.add_argument('--create-new', action='store_true', help='Create a new spreadsheet instead of updating existing one')
     parser.add_argument('--credentials', default='credentials.json', help='Path to Google API credentials file')
     parser.add_argument('--token', default='token.json', help='Path to token file for storing authentication')
     parser.add_argument('--to-csv', help='Save extracted data to CSV file instead of Google Sheets')
+    parser.add_argument('--require-reconciled', action='store_true',
+                        help="Don't save or upload the receipt if its lines don't add up to the printed total")
+    add_sink_arguments(parser)
+    add_cache_arguments(parser)
+    add_sheets_arguments(parser)
+    add_sheet_layout_arguments(parser)
+    add_profile_argument(parser)
+    parser.add_argument('--no-daemon', action='store_true', help='Process locally even if a receipt server is running')
+    parser.add_argument('--socket', default=str(DEFAULT_SOCKET_PATH), help=f'Receipt server socket (default: {DEFAULT_SOCKET_PATH})')
 
     args = parser.parse_args()
 
-    if not args.to_csv and not args.create_new and not args.spreadsheet_id:
-        print("Error: Either --to-csv, --spreadsheet-id, or --create-new must be provided.")
+    local_sinks = has_sinks(args)
+    if not args.to_csv and not args.create_new and not args.spreadsheet_id and not local_sinks:
+        print("Error: Either --to-csv, --to-parquet, --to-arrow, --to-sqlite, --spreadsheet-id, or --create-new must be provided.")
         sys.exit(1)
 
+    # Hand the job to a warm receipt server if one is running with the same settings (profiling
+    # and local sinks always run locally)
+    if not args.no_daemon and not args.profile and not local_sinks:
+        reply = forward_to_daemon({
+            'pdf_path': str(Path(args.pdf_path).resolve()),
+            'store': args.store,
+            'spreadsheet_id': args.spreadsheet_id,
+            'sheet_name': args.sheet_name,
+            'create_new': args.create_new,
+            'csv_path': str(Path(args.to_csv).resolve()) if args.to_csv else None,
+            'no_cache': args.no_cache,
+            'refresh_cache': args.refresh_cache,
+            'require_reconciled': args.require_reconciled,
+            'sheet_update': args.sheet_update,
+            'sheet_layout': args.sheet_layout,
+            'sheet_sums': args.sheet_sums,
+            'settings': daemon_settings(args),
+        }, args.socket)
+        if reply is not None:
+            print(f"Processed by receipt server: {args.pdf_path}: {reply.get('detail', '')}")
+            if reply.get('status') != 'ok':
+                sys.exit(1)
+            return
+
+    profiler = StageProfiler() if args.profile else None
+
+    store = args.store
+    if store == AUTO_STORE:
+        with (profiler or NullProfiler()).stage('detect_store'):
+            store = detect_store(args.pdf_path)
+        if store is None:
+            print(f"Error: Could not detect the store of {args.pdf_path}. Use --store {' or '.join(store_names())}.")
+            sys.exit(1)
+        print(f"Detected store: {store}")
+
     # Create the appropriate store parser
-    if args.store == 'ICA':
-        store_parser = ICAParser()
-    elif args.store == 'WILLYS':
-        store_parser = WillysParser()
-    else:
-        print(f"Error: Unknown store type '{args.store}'")
-        sys.exit(1)
+    store_parser = create_store_parser(store)
 
     # Initialize processor
-    processor = ReceiptProcessor(store_parser, args.store, args.credentials, args.token)
+    processor = ReceiptProcessor(store_parser, store, args.credentials, args.token,
+                                 cache=open_cache(args), refresh_cache=args.refresh_cache, profiler=profiler,
+                                 scheduler=scheduler_from_args(args), sheets_endpoint=args.sheets_endpoint,
+                                 diff_updates=args.sheet_update == 'diff', sheet_layout=args.sheet_layout,
+                                 precomputed_sums=args.sheet_sums == 'values',
+                                 sheet_index=SpreadsheetIndex(args.sheet_index), cell_budget=args.cell_budget)
+
+    sinks = open_sinks(args)
 
     # Process the receipt
-    processor.process_receipt(
-        args.pdf_path,
-        args.spreadsheet_id,
-        args.sheet_name,
-        args.create_new,
-        args.to_csv
-    )
+    with processor.profiler.stage('process_receipt'):
+        processor.process_receipt(
+            args.pdf_path,
+            args.spreadsheet_id,
+            args.sheet_name,
+            args.create_new,
+            args.to_csv,
+            sinks,
+            args.require_reconciled
+        )
+
+    for sink in sinks:
+        sink.close()
+
+    if processor.service:
+        print(processor.scheduler.summary())
+
+    if profiler:
+        write_profile(dict(pdf_path=args.pdf_path, sheets_quota=processor.scheduler.report(), **profiler.report()),
+                      args.profile)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()